@@ -0,0 +1,230 @@
+import os
+import abc
+import time
+import uuid
+import random
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+from urllib.parse import unquote
+from apify_client import ApifyClientAsync
+from loguru import logger
+
+if TYPE_CHECKING:
+    from .actors import ActorConfig
+
+# Run statuses after which no more items are pushed to the run's dataset
+TERMINAL_RUN_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+
+
+class ActorBackend(abc.ABC):
+    """
+    Interface of the service actors are run on. Runs are dicts with at least "id", "status" and
+    "defaultDatasetId", as returned by the Apify API.
+    """
+    @abc.abstractmethod
+    async def start(self, actor_config: 'ActorConfig', run_input: dict) -> dict:
+        """
+        Start an actor run and return it without waiting for it to finish.
+        """
+
+    @abc.abstractmethod
+    async def get_run(self, run_id: str) -> dict:
+        """
+        Returns the current state of a run.
+        """
+
+    @abc.abstractmethod
+    async def list_items(self, dataset_id: str, offset: int, limit: int) -> tuple:
+        """
+        Returns up to `limit` dataset items from `offset` on, and the number of items in the dataset at the time
+        of the request (None when unknown). The service may return fewer than `limit` items per request.
+        """
+
+    async def call(self, actor_config: 'ActorConfig', run_input: dict, poll_interval_secs: float = 1) -> dict:
+        """
+        Start an actor run and wait for it to finish.
+        """
+        run = await self.start(actor_config, run_input)
+        while run["status"] not in TERMINAL_RUN_STATUSES:
+            await asyncio.sleep(poll_interval_secs)
+            run = await self.get_run(run["id"])
+        return run
+
+    async def iterate_items(self, dataset_id: str, page_size: int = 1000):
+        offset = 0
+        while True:
+            items, total = await self.list_items(dataset_id, offset, page_size)
+            for item in items:
+                yield item
+            offset += len(items)
+            if not items or (total is not None and offset >= total):
+                break
+
+    async def close(self):
+        """
+        Releases the connections of the backend.
+        """
+
+
+class ApifyActorBackend(ActorBackend):
+    """
+    Runs actors on Apify through one ApifyClientAsync, whose HTTP connection pool is reused by every call. A client
+    passed in stays open on close(), the caller owns it.
+    """
+    def __init__(self, api_key: str = None, client: ApifyClientAsync = None):
+        self.client = client or ApifyClientAsync(api_key or os.getenv("APIFY_API_KEY"))
+        self._owns_client = client is None
+
+    async def start(self, actor_config: 'ActorConfig', run_input: dict) -> dict:
+        return await self.client.actor(actor_config.actor_id).start(run_input=run_input,
+                                                                    timeout_secs=actor_config.timeout_secs,
+                                                                    memory_mbytes=actor_config.memory_mbytes)
+
+    async def call(self, actor_config: 'ActorConfig', run_input: dict, poll_interval_secs: float = 1) -> dict:
+        return await self.client.actor(actor_config.actor_id).call(run_input=run_input,
+                                                                   timeout_secs=actor_config.timeout_secs,
+                                                                   memory_mbytes=actor_config.memory_mbytes)
+
+    async def get_run(self, run_id: str) -> dict:
+        return await self.client.run(run_id).get()
+
+    async def list_items(self, dataset_id: str, offset: int, limit: int) -> tuple:
+        page = await self.client.dataset(dataset_id).list_items(offset=offset, limit=limit)
+        return page.items, page.total
+
+    async def iterate_items(self, dataset_id: str, page_size: int = 1000):
+        async for item in self.client.dataset(dataset_id).iterate_items():
+            yield item
+
+    async def close(self):
+        if not self._owns_client:
+            return
+        http_client = self.client.http_client
+        # apify-client 1.x keeps its session as an httpx.AsyncClient, later versions close it themselves
+        aclose = getattr(http_client, "aclose", None) or http_client.httpx_async_client.aclose
+        await aclose()
+
+
+class FakeActorBackend(ActorBackend):
+    """
+    Local stand-in for the apidojo tweet scraper actor, for load testing the pipeline without Apify.
+
+    A run produces `total_items` items (capped by the run's maxItems) at `items_per_sec`, and every request
+    takes `latency_secs`. Like the Apify API, at most `page_size` items are returned per request. Items are
+    generated from their index on request, in the apidojo shape, so runs of any size take no memory.
+    """
+    def __init__(self, total_items: int = 1000, latency_secs: float = 0.05, page_size: int = 1000,
+                 items_per_sec: float = 0, users: int = 500, seed: int = 0):
+        self.total_items = total_items
+        self.latency_secs = latency_secs
+        self.page_size = page_size
+        self.items_per_sec = items_per_sec  # 0 produces all items at once
+        self.users = users
+        self.seed = seed
+        self._runs = {}
+
+    async def start(self, actor_config: 'ActorConfig', run_input: dict) -> dict:
+        await asyncio.sleep(self.latency_secs)
+        total = min(self.total_items, run_input.get("maxItems") or self.total_items)
+        start = datetime.strptime(run_input.get("start", "2024-07-01"), "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        end = (datetime.strptime(run_input["end"], "%Y-%m-%d").replace(tzinfo=timezone.utc) if run_input.get("end")
+               else datetime.now(timezone.utc))
+        token = unquote(run_input.get("startUrls", ["q=$TOKEN"])[0].split("q=")[-1]).lstrip("$")
+
+        run_id = uuid.uuid4().hex
+        self._runs[run_id] = {"started_at": time.monotonic(), "total": total, "start": start,
+                              "span_secs": max((end - start).total_seconds(), 1), "token": token}
+        logger.info(f"Started fake actor run {run_id} producing {total} items")
+        return self._run(run_id)
+
+    def _produced(self, state: dict) -> int:
+        if not self.items_per_sec:
+            return state["total"]
+        return min(state["total"], int((time.monotonic() - state["started_at"]) * self.items_per_sec))
+
+    def _run(self, run_id: str) -> dict:
+        state = self._runs[run_id]
+        status = "SUCCEEDED" if self._produced(state) >= state["total"] else "RUNNING"
+        return {"id": run_id, "status": status, "defaultDatasetId": run_id}
+
+    async def get_run(self, run_id: str) -> dict:
+        await asyncio.sleep(self.latency_secs)
+        return self._run(run_id)
+
+    async def list_items(self, dataset_id: str, offset: int, limit: int) -> tuple:
+        await asyncio.sleep(self.latency_secs)
+        state = self._runs[dataset_id]
+        produced = self._produced(state)
+        end = min(offset + limit, offset + self.page_size, produced)
+        return [self._item(state, index) for index in range(offset, end)], produced
+
+    def _item(self, state: dict, index: int) -> dict:
+        rng = random.Random(self.seed * 1_000_003 + index)
+        # Few prolific authors and many occasional ones, as in real search results
+        user = int(self.users * rng.random() ** 3)
+        # Newest first, like a "Latest" search, with snowflake ids derived from the creation time
+        created_at = state["start"] + timedelta(seconds=state["span_secs"] * (1 - index / max(state["total"], 1)))
+        tweet_id = str((int(created_at.timestamp() * 1000) - 1288834974657) << 22 | (index & 0x3FFFFF))
+        user_created_at = datetime(2010, 1, 1, tzinfo=timezone.utc) + timedelta(days=user % 4000)
+        hashtags = [{"text": tag} for tag in rng.sample(["crypto", "memecoin", state["token"].lower(), "altseason",
+                                                         "web3", "bullrun"], rng.randint(0, 3))]
+        media_keys = [f"3_{tweet_id}_{position}" for position in range(rng.choice([0, 0, 0, 1, 2]))]
+        media = [{"media_key": key, "media_url_https": f"https://pbs.twimg.com/media/{key}.jpg", "type": "photo"}
+                 for key in media_keys]
+        item = {
+            "type": "tweet",
+            "id": tweet_id,
+            "url": f"https://x.com/user{user}/status/{tweet_id}",
+            "twitterUrl": f"https://twitter.com/user{user}/status/{tweet_id}",
+            "text": f"${state['token']} " + " ".join("#" + tag["text"] for tag in hashtags) + f" tweet {index}",
+            "retweetCount": rng.randint(0, 200),
+            "replyCount": rng.randint(0, 100),
+            "likeCount": rng.randint(5, 5000),
+            "quoteCount": rng.randint(0, 20),
+            "createdAt": created_at.strftime("%a %b %d %H:%M:%S +0000 %Y"),
+            "lang": "en",
+            "isReply": False,
+            "author": {
+                "type": "user",
+                "userName": f"user{user}",
+                "name": f"User {user}",
+                "id": str(10_000_000 + user),
+                "isVerified": user % 7 == 0,
+                "isBlueVerified": user % 3 == 0,
+                "followers": (user * 7919) % 250_000,
+                "following": (user * 104_729) % 5000,
+                "statusesCount": (user * 15_485_863) % 100_000,
+                "location": ["", "Unknown", "Berlin", "New York", "Lagos", "Singapore", "São Paulo"][user % 7],
+                "createdAt": user_created_at.strftime("%a %b %d %H:%M:%S +0000 %Y"),
+            },
+            "entities": {
+                "hashtags": [dict(tag, indices=[0, 0]) for tag in hashtags],
+                "symbols": [{"text": state["token"], "indices": [0, len(state["token"]) + 1]}],
+                "urls": [],
+                "user_mentions": [],
+            },
+        }
+        if media:
+            item["entities"]["media"] = [{"media_key": m["media_key"], "type": "photo"} for m in media]
+            item["extendedEntities"] = {"media": media}
+        return item
+
+
+def get_actor_backend() -> ActorBackend:
+    """
+    Returns the backend selected by APIFY_BACKEND: "apify" (default) or "fake", the latter configured by
+    FAKE_ACTOR_ITEMS, FAKE_ACTOR_LATENCY_SECS, FAKE_ACTOR_PAGE_SIZE, FAKE_ACTOR_ITEMS_PER_SEC and FAKE_ACTOR_USERS.
+    """
+    backend = os.getenv("APIFY_BACKEND", "apify").lower()
+    if backend == "fake":
+        return FakeActorBackend(
+            total_items=int(os.getenv("FAKE_ACTOR_ITEMS", 1000)),
+            latency_secs=float(os.getenv("FAKE_ACTOR_LATENCY_SECS", 0.05)),
+            page_size=int(os.getenv("FAKE_ACTOR_PAGE_SIZE", 1000)),
+            items_per_sec=float(os.getenv("FAKE_ACTOR_ITEMS_PER_SEC", 0)),
+            users=int(os.getenv("FAKE_ACTOR_USERS", 500)),
+        )
+    if backend != "apify":
+        raise ValueError(f"Unknown APIFY_BACKEND: {backend}")
+    return ApifyActorBackend()
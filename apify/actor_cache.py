@@ -0,0 +1,156 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import uuid
+import contextlib
+from loguru import logger
+
+
+class ActorCacheMiss(LookupError):
+    """
+    Raised in replay mode when no cached response exists for an actor run.
+    """
+
+
+class CacheEntryWriter:
+    """
+    Appends pages of items to a new cache entry, see ActorResponseCache.writer.
+    """
+    def __init__(self, file):
+        self._file = file
+        self.discarded = False
+
+    def write(self, items):
+        for item in items:
+            self._file.write(json.dumps(item))
+            self._file.write("\n")
+
+    def discard(self):
+        """
+        Drops the items written so far instead of storing them, e.g. for a run that did not succeed.
+        """
+        self.discarded = True
+
+
+class ActorResponseCache:
+    """
+    On-disk cache of raw actor dataset items, keyed by a hash of the actor ID and its run input.
+
+    Every response is stored as one gzip compressed NDJSON file. Entries expire `ttl_secs` after being written, and
+    the least recently read entries are evicted once the cache grows beyond `max_bytes`.
+    """
+    def __init__(self, cache_dir: str, ttl_secs: float = 86400, max_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl_secs = ttl_secs
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(actor_id: str, run_input: dict) -> str:
+        payload = json.dumps({"actor_id": actor_id, "run_input": run_input}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.ndjson.gz")
+
+    def get(self, key: str, ignore_ttl: bool = False):
+        """
+        Returns an iterator over the cached items of key, or None when they are missing or expired.
+        Expired entries are still returned with ignore_ttl, as replay mode does.
+        """
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if not ignore_ttl and stat.st_mtime + self.ttl_secs < time.time():
+            self._remove(path)
+            return None
+
+        # The modification time is the write time, the access time marks the entry as recently used for eviction
+        os.utime(path, (time.time(), stat.st_mtime))
+        return self._read(path)
+
+    @staticmethod
+    def _read(path: str):
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            for line in file:
+                yield json.loads(line)
+
+    @contextlib.contextmanager
+    def writer(self, key: str):
+        """
+        Context manager returning a CacheEntryWriter for the entry of key. The entry only becomes visible once the
+        block exits without an error, and unless it was discarded.
+        """
+        path = self._path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+                entry = CacheEntryWriter(file)
+                yield entry
+            if not entry.discarded:
+                os.replace(temp_path, path)
+        finally:
+            self._remove(temp_path)
+        self.evict()
+
+    def set(self, key: str, items: list):
+        with self.writer(key) as entry:
+            entry.write(items)
+
+    def evict(self):
+        """
+        Drops expired entries, then the least recently used ones until the cache fits into max_bytes.
+        """
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".ndjson.gz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime + self.ttl_secs < now and not is_replay_mode():
+                self._remove(path)
+            else:
+                entries.append((stat.st_atime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+            logger.debug(f"Evicted cached actor response {path}")
+
+    @staticmethod
+    def _remove(path: str):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def get_actor_cache():
+    """
+    Returns the cache configured by APIFY_CACHE_DIR, APIFY_CACHE_TTL_SECS and APIFY_CACHE_MAX_MB, or None when
+    caching is disabled.
+    """
+    cache_dir = os.getenv("APIFY_CACHE_DIR")
+    if not cache_dir:
+        return None
+    return ActorResponseCache(
+        cache_dir,
+        ttl_secs=float(os.getenv("APIFY_CACHE_TTL_SECS", 86400)),
+        max_bytes=int(os.getenv("APIFY_CACHE_MAX_MB", 1024)) * 1024 * 1024,
+    )
+
+
+def is_replay_mode() -> bool:
+    """
+    In replay mode (APIFY_REPLAY=true) actor responses are only served from the cache, never from Apify.
+    """
+    return os.getenv("APIFY_REPLAY", "false").lower() == "true"
@@ -18,13 +18,19 @@ DEALINGS IN THE SOFTWARE.
 """
 
 import os
+import asyncio
+import contextlib
 import logging
-from apify_client import ApifyClient, ApifyClientAsync
+from apify_client import ApifyClient
 from loguru import logger
 
+from .actor_backends import ActorBackend, TERMINAL_RUN_STATUSES, get_actor_backend
+from .actor_cache import ActorCacheMiss, get_actor_cache, is_replay_mode
+
 from dotenv import load_dotenv
 
 load_dotenv()
+
 class ActorConfig:
     """
     Configuration class for actors in Apify.
@@ -71,7 +77,8 @@ def run_actor(actor_config: ActorConfig, run_input: dict, default_dataset_id: st
     logger.info(f"Fetched {len(data_set)} items from dataset")
     return data_set
 
-async def run_actor_async(actor_config: ActorConfig, run_input: dict, default_dataset_id: str = "defaultDatasetId"):
+async def run_actor_async(actor_config: ActorConfig, run_input: dict, default_dataset_id: str = "defaultDatasetId",
+                          backend: ActorBackend = None):
     """
     Run an actor in Apify and fetch the resulting data.
 
@@ -79,19 +86,29 @@ async def run_actor_async(actor_config: ActorConfig, run_input: dict, default_da
         actor_config (ActorConfig): The configuration to use for running the actor.
         run_input (dict): The input parameters for the actor run.
         default_dataset_id (str, optional): ID of the dataset to fetch data from. Defaults to "defaultDatasetId".
+        backend (ActorBackend, optional): Shared backend to run the actor on. Defaults to get_actor_backend().
+
+    When APIFY_CACHE_DIR is set, the items of succeeded runs are cached on disk by actor ID and run input (see
+    apify.actor_cache), and with APIFY_REPLAY=true they are only ever served from that cache.
 
     Returns:
         list[dict]: List of items fetched from the dataset.
     """
-    # Initialize the Apify client with the API key
-    client = ApifyClientAsync(actor_config.api_key)
+    cache = get_actor_cache()
+    cache_key = cache.key(actor_config.actor_id, run_input) if cache else None
+    cached_items = load_cached_items(cache, cache_key)
+    if cached_items is not None:
+        fetched_items = list(cached_items)
+        logger.info(f"Loaded {len(fetched_items)} cached items for actor: {actor_config.actor_id}")
+        return fetched_items
+
+    backend = backend or get_actor_backend()
     logger.info(f"Running actor: {actor_config.actor_id}")
-    run = await client.actor(actor_config.actor_id).call(run_input=run_input, timeout_secs=actor_config.timeout_secs, memory_mbytes=actor_config.memory_mbytes)  # Start the actor run
+    run = await backend.call(actor_config, run_input)  # Start the actor run and wait for it
     logger.info(f"Actor run: {run}")
 
     # Fetch data items from the specified dataset
-    dataset = client.dataset(run[default_dataset_id])
-    items = dataset.iterate_items()
+    items = backend.iterate_items(run[default_dataset_id])
 
     fetched_items = []
 
@@ -99,4 +116,124 @@ async def run_actor_async(actor_config: ActorConfig, run_input: dict, default_da
         fetched_items.append(item)
 
     logger.info(f"Fetched {len(fetched_items)} items from dataset")
+    if run["status"] != "SUCCEEDED":
+        # Partial results of a failed run must not be replayed as if they were complete
+        logger.warning(f"Actor run {run['id']} finished with status {run['status']}, its items are not cached")
+    elif cache:
+        cache.set(cache_key, fetched_items)
     return fetched_items
+
+
+def load_cached_items(cache, cache_key: str):
+    """
+    Returns the cached items of an actor run, or None on a cache miss. In replay mode a miss raises ActorCacheMiss
+    instead of falling back to Apify.
+    """
+    replay = is_replay_mode()
+    if cache is None:
+        if replay:
+            raise ActorCacheMiss("Replay mode requires APIFY_CACHE_DIR to be set")
+        return None
+
+    cached_items = cache.get(cache_key, ignore_ttl=replay)
+    if cached_items is None and replay:
+        raise ActorCacheMiss(f"No cached actor response for key {cache_key}")
+    return cached_items
+
+
+async def stream_actor_async(actor_config: ActorConfig, run_input: dict, default_dataset_id: str = "defaultDatasetId",
+                             backend: ActorBackend = None, page_size: int = 1000, max_parallel_pages: int = 4,
+                             poll_interval_secs: float = 5):
+    """
+    Start an actor in Apify and yield its dataset items page by page while the run is still in progress.
+
+    Up to `max_parallel_pages` pages are requested concurrently by offset, pages are yielded in dataset order.
+    Once every item the dataset holds (its item count, as reported with each page) is read the reader has caught
+    up with the run, and it polls again after `poll_interval_secs` until the run has finished and its dataset is
+    drained. A short page alone does not end the stream, as the service may cap the page size below `page_size`.
+
+    Like run_actor_async, items are served from and written to the actor response cache when APIFY_CACHE_DIR is set;
+    the items of a run that does not succeed are not cached.
+
+    Args:
+        actor_config (ActorConfig): The configuration to use for running the actor.
+        run_input (dict): The input parameters for the actor run.
+        default_dataset_id (str, optional): ID of the dataset to fetch data from. Defaults to "defaultDatasetId".
+        backend (ActorBackend, optional): Shared backend to run the actor on. Defaults to get_actor_backend().
+        page_size (int, optional): Number of items requested per page. Defaults to 1000.
+        max_parallel_pages (int, optional): Number of pages requested at once. Defaults to 4.
+        poll_interval_secs (float, optional): Wait between polls once all available items are read. Defaults to 5.
+
+    Yields:
+        list[dict]: Pages of items fetched from the dataset.
+    """
+    cache = get_actor_cache()
+    cache_key = cache.key(actor_config.actor_id, run_input) if cache else None
+    cached_items = load_cached_items(cache, cache_key)
+    if cached_items is not None:
+        logger.info(f"Replaying cached items for actor: {actor_config.actor_id}")
+        page = []
+        for item in cached_items:
+            page.append(item)
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+        return
+
+    finished_run = {}
+    with cache.writer(cache_key) if cache else contextlib.nullcontext(None) as cache_entry:
+        async for page in _stream_actor_pages(actor_config, run_input, default_dataset_id, backend, page_size,
+                                              max_parallel_pages, poll_interval_secs, finished_run):
+            if cache_entry:
+                cache_entry.write(page)
+            yield page
+        if cache_entry and finished_run.get("status") != "SUCCEEDED":
+            logger.warning(f"Not caching the items of actor run {finished_run.get('id')}")
+            cache_entry.discard()
+
+
+async def _stream_actor_pages(actor_config: ActorConfig, run_input: dict, default_dataset_id: str,
+                              backend: ActorBackend, page_size: int, max_parallel_pages: int,
+                              poll_interval_secs: float, finished_run: dict):
+    backend = backend or get_actor_backend()
+    logger.info(f"Starting actor: {actor_config.actor_id}")
+    run = await backend.start(actor_config, run_input)
+    logger.info(f"Actor run: {run}")
+
+    dataset_id = run[default_dataset_id]
+    offset, limit = 0, page_size
+    while True:
+        # Read the status before the pages, so a finished run is only left once its final items were read
+        run = await backend.get_run(run["id"]) or run
+        finished = run["status"] in TERMINAL_RUN_STATUSES
+
+        starts = [offset + index * limit for index in range(max(1, max_parallel_pages))]
+        pages = await asyncio.gather(*(backend.list_items(dataset_id, start, limit) for start in starts))
+
+        total, empty = None, False
+        for start, (items, page_total) in zip(starts, pages):
+            if page_total is not None:
+                total = max(total or 0, page_total)
+            if start != offset:
+                # A short page left a gap, the following pages are requested again from the new offset
+                break
+            if not items:
+                empty = True
+                break
+            offset += len(items)
+            yield items
+            if len(items) < limit and total is not None and offset < total:
+                # The service caps the page size, request pages of that size from now on
+                limit = len(items)
+
+        if empty or (total is not None and offset >= total):
+            if finished:
+                break
+            await asyncio.sleep(poll_interval_secs)
+
+    finished_run.update(run)
+    if run["status"] != "SUCCEEDED":
+        logger.warning(f"Actor run {run['id']} finished with status {run['status']}")
+    logger.info(f"Streamed {offset} items from dataset")
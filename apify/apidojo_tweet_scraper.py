@@ -1,13 +1,19 @@
 import os
 from loguru import logger
-from .actors import run_actor_async, ActorConfig
-from datetime import datetime, timezone
+from .actors import run_actor_async, stream_actor_async, ActorConfig
+from .tweet_mapper import TweetBatchMapper, parse_twitter_date
+from datetime import datetime, timedelta
 import asyncio
-import json
+
+from helpers.dataset_export import export_dataset
+from records import TweetRecord
+from staging_graph import StagingGraph
 
 class ApiDojoTweetScraper:
-    def __init__(self, token, start_date=None, end_date=None):
+    def __init__(self, token, start_date=None, end_date=None, backend=None):
         self.token = token
+        self.backend = backend  # Optional shared ActorBackend
+        self.mapper = TweetBatchMapper(token)  # Keeps derived author fields across pages
         self.actor_config = ActorConfig("61RPP7dywgiy0JPD0")
         self.actor_config.timeout_secs = 120
 
@@ -21,14 +27,124 @@ class ApiDojoTweetScraper:
         self.min_replies = int(os.getenv("MIN_REPLIES", 5))
         self.min_retweets = int(os.getenv("MIN_RETWEETS", 5))
 
+        # Dataset paging used by stream_token_mentions
+        self.page_size = int(os.getenv("APIFY_PAGE_SIZE", 1000))
+        self.max_parallel_pages = int(os.getenv("APIFY_MAX_PARALLEL_PAGES", 4))
+
+        # Sharded scraping: one actor run per window of this many days (0 scrapes the range in a single run)
+        self.window_days = int(os.getenv("SCRAPE_WINDOW_DAYS", 0))
+        self.max_concurrent_runs = int(os.getenv("SCRAPE_MAX_CONCURRENT_RUNS", 4))
+
     async def search_token_mentions(self):
         url = f"https://twitter.com/search?q=%24{self.token}"
         logger.info(f"Scraping data for token: ${self.token} from {self.start_date} to {self.end_date or 'now'}")
         results = await self.searchBatch(url)
         return self.map(results)
 
+    async def stream_token_mentions(self):
+        """
+        Yield mapped tweets of the token as the actor run produces them, instead of after the whole scrape.
+        """
+        url = f"https://twitter.com/search?q=%24{self.token}"
+        logger.info(f"Streaming data for token: ${self.token} from {self.start_date} to {self.end_date or 'now'}")
+        if self.window_days > 0:
+            async for structured_item in self.stream_sharded(url):
+                yield structured_item
+            return
+
+        async for page in stream_actor_async(self.actor_config, self.build_run_input(url), backend=self.backend,
+                                             page_size=self.page_size, max_parallel_pages=self.max_parallel_pages):
+            for structured_item in self.map(page):
+                yield structured_item
+
+    def time_windows(self) -> list:
+        """
+        Split start_date..end_date (today included when no end date is set) into windows of window_days days.
+        Window ends are exclusive, like the actor's end date.
+        """
+        start = datetime.strptime(self.start_date, "%Y-%m-%d")
+        if self.end_date:
+            end = datetime.strptime(self.end_date, "%Y-%m-%d")
+        else:
+            end = datetime.strptime(datetime.utcnow().strftime("%Y-%m-%d"), "%Y-%m-%d") + timedelta(days=1)
+
+        windows = []
+        while start < end:
+            window_end = min(start + timedelta(days=self.window_days), end)
+            windows.append((start, window_end))
+            start = window_end
+        return windows
+
+    async def stream_sharded(self, url: str):
+        """
+        Yield mapped tweets from one actor run per time window, at most max_concurrent_runs at a time, deduplicated
+        by tweet id. A window that returns max_items items was probably truncated, so it is split in half and both
+        halves are scraped again, down to single days.
+
+        When a window fails, the windows still running are cancelled and its error is raised.
+        """
+        queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_runs))
+        windows = set()
+
+        def spawn_window(start, end):
+            windows.add(asyncio.create_task(scrape_window(start, end)))
+
+        async def scrape_window(start, end):
+            async with semaphore:
+                items = await run_actor_async(self.actor_config, self.build_run_input(url, start, end),
+                                              backend=self.backend)
+            await queue.put(self.map(items))
+
+            if len(items) >= self.max_items:
+                if end - start > timedelta(days=1):
+                    middle = start + timedelta(days=(end - start).days // 2)
+                    logger.info(f"Window {start:%Y-%m-%d}..{end:%Y-%m-%d} hit the item cap, splitting at {middle:%Y-%m-%d}")
+                    spawn_window(start, middle)
+                    spawn_window(middle, end)
+                else:
+                    logger.warning(f"Window {start:%Y-%m-%d}..{end:%Y-%m-%d} hit the item cap of {self.max_items}, "
+                                   f"results are truncated")
+
+        async def scrape_all():
+            try:
+                for start, end in self.time_windows():
+                    spawn_window(start, end)
+                # Split windows add their halves while the others run, so wait again after every completion
+                while windows:
+                    done, _ = await asyncio.wait(windows, return_when=asyncio.FIRST_COMPLETED)
+                    windows.difference_update(done)
+                    for window in done:
+                        window.result()  # Raises the failure of a window
+            finally:
+                for window in windows:
+                    window.cancel()
+                await asyncio.gather(*windows, return_exceptions=True)
+                await queue.put(None)
+
+        scraping = asyncio.create_task(scrape_all())
+        seen_tweet_ids = set()
+        try:
+            while (structured_items := await queue.get()) is not None:
+                for structured_item in structured_items:
+                    tweet_id = structured_item.tweet.id
+                    if tweet_id not in seen_tweet_ids:
+                        seen_tweet_ids.add(tweet_id)
+                        yield structured_item
+            await scraping  # Surface a failed window
+        finally:
+            if not scraping.done():
+                scraping.cancel()
+        logger.info(f"Scraped {len(seen_tweet_ids)} unique tweets for token: ${self.token}")
+
     async def searchBatch(self, url: str):
-        # Set up input for run_actor_async; only include 'end' if it's defined
+        results = await run_actor_async(self.actor_config, self.build_run_input(url), backend=self.backend)
+        return results
+
+    def build_run_input(self, url: str, start: datetime = None, end: datetime = None) -> dict:
+        # Set up input for the actor run; only include 'end' if it's defined
+        start_date = start.strftime("%Y-%m-%d") if start else self.start_date
+        end_date = end.strftime("%Y-%m-%d") if end else self.end_date
         run_input = {
             "includeSearchTerms": False,
             "maxItems": self.max_items,
@@ -41,110 +157,47 @@ class ApiDojoTweetScraper:
             "onlyVerifiedUsers": False,
             "onlyVideo": False,
             "sort": "Latest",
-            "start": self.start_date,
+            "start": start_date,
             "startUrls": [url],
             "tweetLanguage": "en",
             "proxyConfiguration": {"useApifyProxy": True, "groups": ["RESIDENTIAL"]}
         }
-        if self.end_date:  # Add end date only if defined
-            run_input["end"] = self.end_date
-
-        results = await run_actor_async(self.actor_config, run_input)
-        return results
+        if end_date:  # Add end date only if defined
+            run_input["end"] = end_date
+        return run_input
 
     def format_date(self, date_str: str):
         """
         Format the date from Twitter's createdAt format to ISO format with UTC timezone.
         """
-        try:
-            parsed_date = datetime.strptime(date_str, "%a %b %d %H:%M:%S %z %Y")
-            return parsed_date.astimezone(timezone.utc).isoformat(sep=' ', timespec='seconds')
-        except ValueError as e:
-            logger.error(f"Error parsing date '{date_str}': {e}")
-            return None
+        return parse_twitter_date(date_str)
 
-    def map_item(self, item) -> dict:
+    def map_item(self, item):
         """
-        Map a raw tweet data item to a structured dictionary format.
+        Map a raw tweet data item to a TweetRecord, or None when the item is malformed.
         """
         try:
-            hashtags = ["#" + x["text"] for x in item.get("entities", {}).get('hashtags', [])]
-            images = []
-            extended_entities = item.get("extendedEntities")
-            if extended_entities:
-                media_urls = {m["media_key"]: m["media_url_https"] for m in extended_entities["media"] if
-                              m.get("media_url_https")}
-                for media in item.get("entities", {}).get('media', []):
-                    media_key = media.get("media_key")
-                    if media_key:
-                        images.append(media_urls[media_key])
-
-            # Parse the tweet's creation date
-            tweet_timestamp = self.format_date(item.get("createdAt", ""))
-
-            tweet = {
-                'id': item['id'],
-                'url': item['twitterUrl'],
-                'text': item.get('text'),
-                'likes': item['likeCount'],
-                'images': images,
-                'timestamp': tweet_timestamp
-            }
-
-            user_account = {
-                'username': item['author']['userName'],
-                'user_id': item['author']['id'],
-                'is_verified': item['author']['isVerified'],
-                'follower_count': item['author'].get('followers', 0),
-                'account_age': self.format_date(item['author'].get('createdAt', "")),
-                'engagement_level': item.get('likeCount', 0) + item.get('retweetCount', 0),
-                'total_tweets': item['author'].get('statusesCount', 0)  # Add the number of tweets the user has posted
-            }
-
-            region = {
-                'name': item['author'].get('location', 'Unknown')
-            }
-
-            # Define edges and relationships between entities
-            edges = [
-                {'type': 'POSTED', 'from': user_account['user_id'], 'to': tweet['id'],
-                 'attributes': {'timestamp': tweet['timestamp'], 'likes': tweet['likes']}},
-                {'type': 'MENTIONS', 'from': user_account['user_id'], 'to': self.token,
-                 'attributes': {'timestamp': tweet['timestamp'], 'hashtag_count': len(hashtags)}},
-                {'type': 'LOCATED_IN', 'from': user_account['user_id'], 'to': region['name']},
-                {'type': 'MENTIONED_IN', 'from': self.token, 'to': tweet['id']}
-            ]
-
-            return {
-                'token': self.token,
-                'tweet': tweet,
-                'user_account': user_account,
-                'region': region,
-                'hashtags': hashtags,
-                'edges': edges
-            }
+            return self.mapper.map_item(item)
         except Exception as e:
-            logger.error(f"❌ Error while converting tweet to structured format: {e}, tweet = {item}")
-            return {}
+            logger.error(f"❌ Error while converting tweet {item.get('id')} to structured format: {e}")
+            return None
 
     def map(self, input: list) -> list:
         """
         Convert all tweet items in input to structured data format for the given token.
         """
-        structured_data = []
-        for item in input:
-            structured_item = self.map_item(item)
-            if structured_item:
-                structured_data.append(structured_item)
-        return structured_data
-
-    def export_to_json(self, data: list, filename: str):
+        return self.mapper.map(input)
+
+    def export_to_json(self, data, filename: str):
         """
-        Export the mapped data to a JSON file.
+        Export the mapped data (a list of TweetRecords or entries, or a StagingGraph) to a JSON file.
         """
         try:
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=4)
+            if isinstance(data, StagingGraph):
+                entries = data.entries()
+            else:
+                entries = (entry.to_dict() if isinstance(entry, TweetRecord) else entry for entry in data)
+            export_dataset(entries, filename)
             print(f"Data successfully exported to {filename}")
         except Exception as e:
             logger.error(f"❌ Error exporting data to JSON: {e}")
@@ -166,7 +219,7 @@ if __name__ == '__main__':
         # Display results for verification
         if data_set:
             for data in data_set[:5]:  # Displaying first 5 entries for brevity
-                print(data)
+                print(data.to_dict())
 
             # Export results to JSON
             scraper.export_to_json(data_set, "tweets.json")
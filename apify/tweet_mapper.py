@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+from loguru import logger
+
+from records import Region, Tweet, TweetRecord, UserAccount
+
+MONTHS = {month: f"{number:02d}" for number, month in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), start=1)}
+
+
+def parse_twitter_date(date_str: str):
+    """
+    Format a date from Twitter's createdAt format ("Tue Oct 15 12:00:00 +0000 2024") to ISO format with UTC
+    timezone ("2024-10-15 12:00:00+00:00").
+
+    Twitter always sends UTC, which is converted by slicing the fixed width fields. Any other offset or layout
+    falls back to strptime. Returns None for unparsable dates.
+    """
+    if len(date_str) == 30 and date_str[20:25] == "+0000" and date_str[4:7] in MONTHS:
+        day, clock, year = date_str[8:10], date_str[11:19], date_str[26:30]
+        if day.isdigit() and year.isdigit() and clock[2] == ":" and clock[5] == ":":
+            return f"{year}-{MONTHS[date_str[4:7]]}-{day} {clock}+00:00"
+
+    try:
+        parsed_date = datetime.strptime(date_str, "%a %b %d %H:%M:%S %z %Y")
+        return parsed_date.astimezone(timezone.utc).isoformat(sep=' ', timespec='seconds')
+    except ValueError as e:
+        logger.error(f"Error parsing date '{date_str}': {e}")
+        return None
+
+
+class TweetBatchMapper:
+    """
+    Maps raw apidojo tweet items of one token to TweetRecords (see ApiDojoTweetScraper.map_item).
+
+    Fields derived from the author are computed once per author id and reused for all of their tweets, and one
+    Region instance is shared per location.
+    """
+    def __init__(self, token: str):
+        self.token = token
+        self._authors = {}  # author id -> (username, user_id, is_verified, follower_count, account_age, total_tweets, Region)
+        self._regions = {}  # location -> Region
+
+    def _author(self, author: dict) -> tuple:
+        derived = self._authors.get(author['id'])
+        if derived is None:
+            derived = (
+                author['userName'],
+                author['id'],
+                author['isVerified'],
+                author.get('followers', 0),
+                parse_twitter_date(author.get('createdAt', "")),
+                author.get('statusesCount', 0),
+                self._region(author.get('location', 'Unknown')),
+            )
+            self._authors[author['id']] = derived
+        return derived
+
+    def _region(self, name: str) -> Region:
+        region = self._regions.get(name)
+        if region is None:
+            region = self._regions[name] = Region(name)
+        return region
+
+    def map_item(self, item: dict) -> TweetRecord:
+        """
+        Map a raw tweet data item to a TweetRecord. Raises on malformed items.
+        """
+        entities = item.get("entities", {})
+        hashtags = tuple("#" + x["text"] for x in entities.get('hashtags', []))
+        images = []
+        extended_entities = item.get("extendedEntities")
+        if extended_entities:
+            media_urls = {m["media_key"]: m["media_url_https"] for m in extended_entities["media"] if
+                          m.get("media_url_https")}
+            for media in entities.get('media', []):
+                media_key = media.get("media_key")
+                if media_key:
+                    images.append(media_urls[media_key])
+
+        username, user_id, is_verified, follower_count, account_age, total_tweets, region = \
+            self._author(item['author'])
+
+        return TweetRecord(
+            self.token,
+            Tweet(item['id'], item['twitterUrl'], item.get('text'), item['likeCount'], tuple(images),
+                  parse_twitter_date(item.get("createdAt", ""))),
+            UserAccount(username, user_id, is_verified, follower_count, account_age,
+                        item.get('likeCount', 0) + item.get('retweetCount', 0), total_tweets),
+            region,
+            hashtags
+        )
+
+    def map(self, items) -> list:
+        """
+        Map all items, skipping (and logging the id of) malformed ones.
+        """
+        structured_data = []
+        append = structured_data.append
+        map_item = self.map_item
+        for item in items:
+            try:
+                append(map_item(item))
+            except Exception as e:
+                logger.error(f"❌ Error while converting tweet {item.get('id')} to structured format: "
+                             f"{type(e).__name__}: {e}")
+        return structured_data
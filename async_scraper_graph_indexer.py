@@ -0,0 +1,171 @@
+import asyncio
+import os
+from neo4j import AsyncGraphDatabase
+from loguru import logger
+
+from helpers.ttl_cache import invalidate_token
+from helpers.cypher_metrics import run_plan_async
+from staging_graph import StagingGraph
+
+from scraper_graph_indexer import (
+    BaseScraperGraphIndexer,
+    bump_token_version_plan,
+    cleanup_plan,
+    collect_shared_rows,
+    ensure_schema_plan,
+    merge_delta,
+    new_delta,
+    partition_rows,
+    update_influence_ranks_plan,
+)
+
+
+def create_async_driver(graph_db_url: str = None, graph_db_user: str = None, graph_db_password: str = None):
+    """
+    Creates an async Neo4j driver with one connection pool of GRAPH_MAX_CONNECTION_POOL_SIZE connections.
+
+    Async drivers are bound to the event loop they are used on, so the caller owns the driver for the lifetime of
+    its loop and must close it before the loop shuts down (e.g. IndexingContext, once per run).
+    """
+    return AsyncGraphDatabase.driver(
+        graph_db_url or os.environ.get("GRAPH_DB_URL", "bolt://localhost:7687"),
+        auth=(graph_db_user or os.environ.get("GRAPH_DB_USER", "ops/neo4j"),
+              graph_db_password or os.environ.get("GRAPH_DB_PASSWORD", "password")),
+        max_connection_pool_size=int(os.environ.get("GRAPH_MAX_CONNECTION_POOL_SIZE", 100)),
+        max_transaction_retry_time=float(os.environ.get("GRAPH_MAX_TRANSACTION_RETRY_SECS", 30)),
+    )
+
+
+class AsyncScraperGraphIndexer(BaseScraperGraphIndexer):
+    """
+    asyncio counterpart of ScraperGraphIndexer. It runs the same statement plans, but on an async driver so graph
+    writes can run concurrently with the rest of the indexing pipeline.
+
+    Pass a `driver` to share one connection pool between indexers; its owner closes it. Without one, the indexer
+    creates its own on first use, which `close()` releases.
+    """
+    def __init__(self, graph_db_url: str = None, graph_db_user: str = None, graph_db_password: str = None,
+                 batch_size: int = None, incremental: bool = None, write_parallelism: int = None, driver=None):
+        super().__init__(graph_db_url, graph_db_user, graph_db_password, batch_size, incremental, write_parallelism)
+        self._driver = driver
+        self._owns_driver = driver is None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = create_async_driver(self.graph_db_url, self.graph_db_user, self.graph_db_password)
+        return self._driver
+
+    async def close(self):
+        if self._owns_driver and self._driver is not None:
+            await self._driver.close()
+            self._driver = None
+
+    async def ensure_schema(self) -> dict:
+        """
+        See ScraperGraphIndexer.ensure_schema.
+        """
+        async with self.driver.session() as session:
+            result = await run_plan_async(session, self.metrics, ensure_schema_plan(self.schema_timeout_secs))
+        self._schema_ready = True
+        return result
+
+    async def cleanup_old_token_data(self, current_user_ids: list, scrape_token: str, batch_size: int = None) -> dict:
+        """
+        See ScraperGraphIndexer.cleanup_old_token_data.
+        """
+        async with self.driver.session() as session:
+            return await run_plan_async(session, self.metrics, cleanup_plan(current_user_ids, scrape_token,
+                                                                            batch_size or self.cleanup_batch_size))
+
+    async def update_influence_ranks(self, scrape_token: str):
+        """
+        See ScraperGraphIndexer.update_influence_ranks.
+        """
+        async with self.driver.session() as session:
+            await run_plan_async(session, self.metrics, update_influence_ranks_plan(scrape_token))
+
+    async def mark_token_changed(self, scrape_token: str):
+        """
+        See ScraperGraphIndexer.mark_token_changed.
+        """
+        async with self.driver.session() as session:
+            await run_plan_async(session, self.metrics, bump_token_version_plan(scrape_token))
+        invalidate_token(scrape_token)
+
+    async def _write_batch(self, tx, rows: dict, scrape_token: str, incremental: bool) -> dict:
+        return await run_plan_async(tx, self.metrics, self._write_batch_plan(rows, scrape_token, incremental))
+
+    async def _write_shared_nodes(self, graph: StagingGraph, scrape_token: str):
+        shared = collect_shared_rows(graph)
+        async with self.driver.session() as session:
+            await session.execute_write(self._write_batch, shared, scrape_token, False)
+        logger.info(f"Pre-created {len(shared['tokens'])} Token and {len(shared['regions'])} Region nodes")
+
+    async def _write_partition(self, graph: StagingGraph, scrape_token: str, batch_size: int,
+                               shared_written: bool = False):
+        delta = new_delta(self.incremental)
+        user_ids = []
+        processed = 0
+
+        async with self.driver.session() as session:
+            for chunk in graph.chunks(batch_size):
+                rows = partition_rows(chunk, shared_written)
+                user_ids.extend(chunk.users)
+                merge_delta(delta, await session.execute_write(self._write_batch, rows, scrape_token,
+                                                               self.incremental))
+                processed += len(chunk)
+                logger.debug("Wrote batch of {} tweets ({}/{}) for token: {}",
+                             len(chunk), processed, len(graph), scrape_token)
+
+        return delta, user_ids
+
+    async def create_nodes_and_edges(self, data, scrape_token: str, batch_size: int = None) -> dict:
+        """
+        See ScraperGraphIndexer.create_nodes_and_edges. Partitions are written concurrently as asyncio tasks,
+        each on its own session from the driver's pool.
+        """
+        batch_size = batch_size or self.batch_size
+        self.metrics.reset()
+        if not self._schema_ready:
+            await self.ensure_schema()
+
+        graph = data if isinstance(data, StagingGraph) else StagingGraph.from_entries(data)
+        delta = new_delta(self.incremental)
+
+        try:
+            current_user_ids = []
+
+            if self.write_parallelism > 1:
+                await self._write_shared_nodes(graph, scrape_token)
+                partitions = [p for p in graph.partition(self.write_parallelism) if len(p)]
+                logger.info(f"Writing {len(graph)} tweets for token {scrape_token} in {len(partitions)} partitions")
+                results = await asyncio.gather(*[
+                    self._write_partition(partition, scrape_token, batch_size, True) for partition in partitions
+                ])
+            else:
+                results = [await self._write_partition(graph, scrape_token, batch_size)]
+
+            for partition_delta, user_ids in results:
+                merge_delta(delta, partition_delta)
+                current_user_ids.extend(user_ids)
+
+            cleanup_counters = await self.cleanup_old_token_data(current_user_ids, scrape_token)
+            logger.info(f"Completed cleanup for old data related to token: {scrape_token}: {cleanup_counters}")
+            self._finish_delta(delta, cleanup_counters, scrape_token)
+
+            await self.update_influence_ranks(scrape_token)
+            logger.info(f"Graph statement metrics for token {scrape_token}: {self.metrics.summary()}")
+
+        except Exception as e:
+            logger.error("An error occurred while creating nodes and edges", extra={
+                "exception_type": e.__class__.__name__,
+                "exception_message": str(e),
+                "exception_args": e.args
+            })
+            raise
+        finally:
+            # Cached influence reads of this token are stale now, even if the run failed half way
+            await self.mark_token_changed(scrape_token)
+
+        return delta
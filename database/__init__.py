@@ -9,6 +9,7 @@ in staff/alembic/versions folder.
 """
 from .base_model import OrmBase
 from .models.dataset_links import DatasetLink
+from .models.scrape_watermarks import ScrapeWatermark
 from .session_manager import db_manager, get_session
 
-__all__ = ["OrmBase", "get_session", "db_manager", "DatasetLink"]
\ No newline at end of file
+__all__ = ["OrmBase", "get_session", "db_manager", "DatasetLink", "ScrapeWatermark"]
\ No newline at end of file
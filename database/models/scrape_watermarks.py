@@ -0,0 +1,65 @@
+from sqlalchemy import Column, String, DateTime, select
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+from database import OrmBase
+
+class ScrapeWatermark(OrmBase):
+    """
+    Model representing the scrape watermark table.
+    This table stores the newest tweet published for each token, so the next run only scrapes from there on.
+    """
+    __tablename__ = 'scrape_watermarks'
+    token = Column(String, primary_key=True)  # Unique token identifier, acts as the primary key
+    last_tweet_timestamp = Column(DateTime, nullable=False)  # Creation time (UTC) of the newest published tweet
+    last_tweet_id = Column(String, nullable=False)  # ID of the newest published tweet
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)  # Timestamp for the update
+
+class ScrapeWatermarkManager:
+    """
+    Manager class for handling operations on the scrape watermark table.
+    """
+    def __init__(self, session_manager):
+        self.session_manager = session_manager
+
+    async def store_watermark(self, token: str, last_tweet_timestamp: datetime, last_tweet_id: str):
+        """
+        Store the newest published tweet of a token. An existing watermark only ever moves forward.
+
+        Args:
+            token (str): The token identifier.
+            last_tweet_timestamp (datetime): Creation time (naive UTC) of the newest published tweet.
+            last_tweet_id (str): ID of the newest published tweet.
+        """
+        async with self.session_manager.session() as session:
+            async with session.begin():
+                stmt = insert(ScrapeWatermark).values(
+                    token=token,
+                    last_tweet_timestamp=last_tweet_timestamp,
+                    last_tweet_id=last_tweet_id,
+                    timestamp=datetime.utcnow()
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['token'],  # Conflict resolution on token column
+                    set_={
+                        'last_tweet_timestamp': stmt.excluded.last_tweet_timestamp,
+                        'last_tweet_id': stmt.excluded.last_tweet_id,
+                        'timestamp': stmt.excluded.timestamp
+                    },
+                    where=ScrapeWatermark.last_tweet_timestamp <= stmt.excluded.last_tweet_timestamp
+                )
+                await session.execute(stmt)
+
+    async def get_watermark(self, token: str):
+        """
+        Retrieve the watermark of a specific token.
+
+        Args:
+            token (str): The token identifier.
+
+        Returns:
+            ScrapeWatermark: The watermark, or None if the token was never published.
+        """
+        async with self.session_manager.session() as session:
+            query = select(ScrapeWatermark).where(ScrapeWatermark.token == token)
+            result = await session.execute(query)
+            return result.scalar_one_or_none()
@@ -0,0 +1,116 @@
+import os
+from neo4j import GraphDatabase
+from loguru import logger
+
+from helpers.ttl_cache import TokenTTLCache
+
+# Top influencers read straight from the aggregates materialized on MENTIONS by the indexer
+TOP_USERS = """
+MATCH (ua:UserAccount)-[m:MENTIONS]->(:Token {name: $token_name})
+WHERE m.rank IS NOT NULL AND m.rank <= $limit
+RETURN ua.user_id AS user_id, ua.username AS username, ua.is_verified AS is_verified,
+       ua.follower_count AS follower_count, m.rank AS rank, m.mention_count AS mention_count,
+       m.total_likes AS total_likes, m.engagement AS engagement, m.last_mentioned_at AS last_mentioned_at
+ORDER BY m.rank
+"""
+
+# Tweet timestamps are stored as 'YYYY-MM-DD HH:MM:SS+00:00', the first 10 characters are the UTC day
+MENTION_TIMELINE = """
+MATCH (:Token {name: $token_name})-[:MENTIONED_IN]->(tw:Tweet)
+WHERE $since IS NULL OR tw.timestamp >= $since
+RETURN substring(tw.timestamp, 0, 10) AS day, count(tw) AS mentions, sum(tw.likes) AS likes
+ORDER BY day
+"""
+
+REGION_BREAKDOWN = """
+MATCH (ua:UserAccount)-[m:MENTIONS]->(:Token {name: $token_name})
+MATCH (ua)-[:LOCATED_IN]->(r:Region)
+RETURN r.name AS region, count(ua) AS users, sum(coalesce(m.mention_count, 0)) AS mentions,
+       sum(coalesce(m.total_likes, 0)) AS likes
+ORDER BY users DESC, region
+LIMIT $limit
+"""
+
+
+TOKEN_DATA_VERSION = """
+MATCH (t:Token {name: $token_name})
+RETURN t.data_version AS version
+"""
+
+
+class GraphInfluenceReader:
+    """
+    Read API over the graph written by ScraperGraphIndexer.
+
+    Results are kept in an LRU / TTL cache keyed by query, token and parameters, together with the data version
+    of the token they were read at. The indexers bump that version on the Token node when create_nodes_and_edges
+    finishes for it, so a cache hit is only served while the token's version is unchanged, whichever process
+    indexed it. Indexers in the same process also drop the entries right away (see
+    helpers.ttl_cache.invalidate_token). Every call returns its own copy of the rows.
+    """
+    def __init__(self, graph_db_url: str = None, graph_db_user: str = None, graph_db_password: str = None,
+                 cache_size: int = None, cache_ttl_secs: float = None):
+        self.graph_db_url = graph_db_url or os.environ.get("GRAPH_DB_URL", "bolt://localhost:7687")
+        self.graph_db_user = graph_db_user or os.environ.get("GRAPH_DB_USER", "ops/neo4j")
+        self.graph_db_password = graph_db_password or os.environ.get("GRAPH_DB_PASSWORD", "password")
+        self.cache = TokenTTLCache(
+            maxsize=cache_size or int(os.environ.get("GRAPH_READ_CACHE_SIZE", 1024)),
+            ttl_secs=cache_ttl_secs or float(os.environ.get("GRAPH_READ_CACHE_TTL_SECS", 300)),
+        )
+        self.driver = GraphDatabase.driver(self.graph_db_url, auth=(self.graph_db_user, self.graph_db_password))
+
+    def close(self):
+        self.driver.close()
+
+    @staticmethod
+    def _token_version(tx, token: str):
+        record = tx.run(TOKEN_DATA_VERSION, token_name=token).single()
+        return record['version'] if record else None
+
+    @classmethod
+    def _read(cls, tx, query: str, token: str, parameters: dict) -> tuple:
+        version = cls._token_version(tx, token)
+        return version, tuple(record.data() for record in tx.run(query, token_name=token, **parameters))
+
+    def _query(self, name: str, query: str, token: str, **parameters) -> list:
+        key = (name, token, tuple(sorted(parameters.items())))
+        cached = self.cache.get(key)
+
+        with self.driver.session() as session:
+            if cached is not None:
+                version, records = cached
+                if session.execute_read(self._token_version, token) == version:
+                    return [dict(record) for record in records]
+
+            version, records = session.execute_read(self._read, query, token, parameters)
+        logger.debug("Graph read {} for token {} returned {} rows", name, token, len(records))
+        self.cache.set(key, (version, records))
+        return [dict(record) for record in records]
+
+    def top_users(self, token: str, limit: int = 10) -> list:
+        """
+        Returns the `limit` most influential users of a token, by materialized rank.
+        """
+        return self._query('top_users', TOP_USERS, token, limit=limit)
+
+    def mention_timeline(self, token: str, since: str = None) -> list:
+        """
+        Returns the number of mentioning tweets and their likes per UTC day, optionally from `since`
+        (an ISO date or timestamp) on.
+        """
+        return self._query('mention_timeline', MENTION_TIMELINE, token, since=since)
+
+    def region_breakdown(self, token: str, limit: int = 25) -> list:
+        """
+        Returns the users, mentions and likes of a token per region, largest regions first.
+        """
+        return self._query('region_breakdown', REGION_BREAKDOWN, token, limit=limit)
+
+    def invalidate(self, token: str = None):
+        """
+        Drops cached results of one token, or of all tokens.
+        """
+        if token is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate_token(token)
@@ -0,0 +1,129 @@
+import time
+import threading
+
+# SummaryCounters fields aggregated per statement
+COUNTER_FIELDS = (
+    "nodes_created",
+    "nodes_deleted",
+    "relationships_created",
+    "relationships_deleted",
+    "properties_set",
+)
+
+
+class StatementMetrics:
+    """
+    Collects timings and update counters per named Cypher statement.
+
+    For every execution the client-side wall time, the server-side `result_available_after` /
+    `result_consumed_after` (milliseconds) and the SummaryCounters of the result summary are added to the
+    totals of the statement name. Safe to use from several writer threads.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = {}
+
+    def reset(self):
+        with self._lock:
+            self._statements = {}
+
+    def record(self, name: str, wall_time_secs: float, summary=None):
+        """
+        Add one execution of `name`.
+
+        Args:
+            name (str): Statement name.
+            wall_time_secs (float): Client-side duration of run + consume.
+            summary (neo4j.ResultSummary, optional): Summary of the consumed result.
+        """
+        with self._lock:
+            stats = self._statements.get(name)
+            if stats is None:
+                stats = {"calls": 0, "wall_time_ms": 0.0, "result_available_after_ms": 0,
+                         "result_consumed_after_ms": 0, **{field: 0 for field in COUNTER_FIELDS}}
+                self._statements[name] = stats
+
+            stats["calls"] += 1
+            stats["wall_time_ms"] += wall_time_secs * 1000
+            if summary is not None:
+                stats["result_available_after_ms"] += summary.result_available_after or 0
+                stats["result_consumed_after_ms"] += summary.result_consumed_after or 0
+                for field in COUNTER_FIELDS:
+                    stats[field] += getattr(summary.counters, field)
+
+    def summary(self) -> dict:
+        """
+        Returns the totals per statement name, slowest statement first.
+        """
+        with self._lock:
+            statements = {name: dict(stats, wall_time_ms=round(stats["wall_time_ms"], 2))
+                          for name, stats in self._statements.items()}
+        return dict(sorted(statements.items(), key=lambda item: item[1]["wall_time_ms"], reverse=True))
+
+
+def run_timed(runner, metrics: StatementMetrics, name: str, query: str, parameters: dict = None):
+    """
+    Run a statement on a session or transaction, consume it and record its metrics.
+
+    Returns:
+        tuple: The list of returned records and the result summary.
+    """
+    started = time.perf_counter()
+    result = runner.run(query, parameters or {})
+    records = list(result)
+    summary = result.consume()
+    metrics.record(name, time.perf_counter() - started, summary)
+    return records, summary
+
+
+async def run_timed_async(runner, metrics: StatementMetrics, name: str, query: str, parameters: dict = None):
+    """
+    Async counterpart of run_timed for AsyncSession / AsyncTransaction runners.
+    """
+    started = time.perf_counter()
+    result = await runner.run(query, parameters or {})
+    records = [record async for record in result]
+    summary = await result.consume()
+    metrics.record(name, time.perf_counter() - started, summary)
+    return records, summary
+
+
+def run_plan(runner, metrics: StatementMetrics, plan):
+    """
+    Execute a statement plan on a session or transaction.
+
+    A plan is a generator yielding (name, query, parameters) for each statement to run; the (records, summary)
+    of run_timed is sent back into it, and a failed statement is raised inside it, so the plan can handle the
+    error. The same plan runs on the sync and the async driver (see run_plan_async).
+
+    Returns:
+        The return value of the plan.
+    """
+    try:
+        statement = next(plan)
+        while True:
+            try:
+                outcome = run_timed(runner, metrics, *statement)
+            except Exception as e:
+                statement = plan.throw(e)
+            else:
+                statement = plan.send(outcome)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def run_plan_async(runner, metrics: StatementMetrics, plan):
+    """
+    Async counterpart of run_plan for AsyncSession / AsyncTransaction runners.
+    """
+    try:
+        statement = next(plan)
+        while True:
+            try:
+                outcome = await run_timed_async(runner, metrics, *statement)
+            except Exception as e:
+                statement = plan.throw(e)
+            else:
+                statement = plan.send(outcome)
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,93 @@
+import json
+import hashlib
+from loguru import logger
+
+from helpers.dataset_export import NORMALIZED_SCHEMA_VERSION, dataset_file_name, export_normalized_dataset
+from helpers.ipfs_cid import file_cid
+
+USERS_CHUNK = "users"
+
+
+class DatasetChunk:
+    """
+    One exported part of a chunked dataset: the users chunk or the tweets of one day, with its local CID.
+    """
+    __slots__ = ('name', 'file_name', 'cid', 'dataset')
+
+    def __init__(self, name: str, file_name: str, cid: str, dataset):
+        self.name = name
+        self.file_name = file_name
+        self.cid = cid
+        self.dataset = dataset
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'cid': self.cid,
+            'sha256': self.dataset.sha256,
+            'size': self.dataset.size,
+            'tweets': self.dataset.items
+        }
+
+
+def export_dataset_chunks(graph, base_name: str, validators: dict = None, max_reject_ratio: float = 0.0):
+    """
+    Exports a staging graph as a chunked dataset: one normalized (v2) document with the regions and users, and
+    one per day with the tweets posted that day, each a valid v2 dataset on its own. Tweets of past days rarely
+    change, so most chunks are byte-identical to, and have the same CID as, the chunks published by the last run.
+
+    Args:
+        graph (StagingGraph): The tweets to export.
+        base_name (str): File name prefix of the chunks (see dataset_file_name).
+        validators (dict, optional): Section name -> row validator (see load_section_validators).
+        max_reject_ratio (float, optional): Share of rejected tweets tolerated over all chunks. Defaults to 0.
+
+    Returns:
+        list[DatasetChunk]: The users chunk followed by the day chunks, or None when too many tweets are rejected.
+    """
+    rejected_keys = {}
+    parts = [(USERS_CHUNK, [('regions', graph.region_rows()), ('users', graph.user_rows()), ('tweets', [])])]
+    for day, tweet_ids in graph.tweets_by_day().items():
+        parts.append((day, [('regions', []), ('users', []), ('tweets', graph.tweet_rows(tweet_ids))]))
+
+    chunks = []
+    for name, sections in parts:
+        file_name = dataset_file_name(f"{base_name}_{name}", "json", NORMALIZED_SCHEMA_VERSION)
+        # Rejected rows are carried across chunks, the ratio is checked once for the whole dataset
+        dataset = export_normalized_dataset(graph, file_name, validators, max_reject_ratio=1.0, sections=sections,
+                                            rejected_keys=rejected_keys)
+        chunks.append(DatasetChunk(name, file_name, file_cid(file_name), dataset))
+
+    count = sum(chunk.dataset.items for chunk in chunks)
+    rejected = sum(chunk.dataset.rejected for chunk in chunks)
+    if rejected > max_reject_ratio * (count + rejected):
+        logger.error(f"Rejected {rejected} of {count + rejected} tweets, more than the tolerated "
+                     f"{max_reject_ratio:.2%}")
+        return None
+    return chunks
+
+
+def build_manifest(token: str, chunks: list) -> dict:
+    """
+    Returns the manifest of a chunked dataset. It only depends on the chunk contents, so an unchanged dataset
+    always has the same manifest, and the same CID.
+    """
+    return {
+        'schema_version': NORMALIZED_SCHEMA_VERSION,
+        'token': token,
+        'tweets': sum(chunk.dataset.items for chunk in chunks),
+        'chunks': [chunk.to_dict() for chunk in chunks]
+    }
+
+
+def write_manifest(manifest: dict, file_name: str) -> tuple:
+    """
+    Writes a manifest as compact JSON.
+
+    Returns:
+        tuple: The CID and SHA-256 of the written file.
+    """
+    content = json.dumps(manifest, separators=(",", ":")).encode("utf-8")
+    with open(file_name, "wb") as file:
+        file.write(content)
+    return file_cid(file_name), hashlib.sha256(content).hexdigest()
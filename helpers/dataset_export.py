@@ -0,0 +1,355 @@
+import os
+import gzip
+import json
+import hashlib
+from loguru import logger
+
+# Version of the entry layout in schemas/dataset_schema.json, carried in the name of every non legacy JSON file
+SCHEMA_VERSION = "v1"
+
+# Normalized layout of schemas/dataset_schema_v2.json: top level regions, users and tweets sections, tweets
+# reference their author by user_id and carry no edges
+NORMALIZED_SCHEMA_VERSION = "v2"
+
+# Dataset format -> file extension
+DATASET_FORMATS = {
+    "json": ".json",              # Legacy pretty printed JSON array
+    "ndjson.gz": ".ndjson.gz",    # One compact entry per line, gzip compressed
+    "ndjson.zst": ".ndjson.zst",  # One compact entry per line, zstd compressed (needs zstandard)
+    "parquet": ".parquet",        # Flattened tweet / user columns (needs pyarrow)
+}
+
+
+class DatasetExport:
+    """
+    Outcome of export_dataset: where the dataset was written, its format, size and SHA-256, the number of items
+    and the number of rejected items, which were written to the quarantine file.
+    """
+    __slots__ = ('file_name', 'size', 'sha256', 'items', 'rejected', 'quarantine_file', 'format', 'schema_version')
+
+    def __init__(self, file_name: str, size: int, sha256: str, items: int, rejected: int = 0,
+                 quarantine_file: str = None, format: str = "json", schema_version: str = SCHEMA_VERSION):
+        self.file_name = file_name
+        self.size = size
+        self.sha256 = sha256
+        self.items = items
+        self.rejected = rejected
+        self.quarantine_file = quarantine_file
+        self.format = format
+        self.schema_version = schema_version
+
+
+def dataset_file_name(base_name: str, format: str = "json", schema_version: str = SCHEMA_VERSION) -> str:
+    """
+    Returns the file name of a dataset. Legacy v1 JSON keeps its plain ".json" name, other formats and schema
+    versions carry both, e.g. "<base_name>.v1.ndjson.gz" or "<base_name>.v2.json".
+    """
+    if format not in DATASET_FORMATS:
+        raise ValueError(f"Unknown dataset format: {format}")
+    if format == "json" and schema_version == SCHEMA_VERSION:
+        return f"{base_name}.json"
+    return f"{base_name}.{schema_version}{DATASET_FORMATS[format]}"
+
+
+class _HashingFile:
+    """
+    Binary file wrapper computing the size and SHA-256 of everything written through it. Closing it (as
+    pyarrow's PythonFile does) leaves the wrapped file open, its owner closes it.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def tell(self) -> int:
+        return self.size
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            self.closed = True
+
+
+class _JsonArrayEncoder:
+    """
+    Same layout as json.dump(indent=4): every entry indented by one level inside the array.
+    """
+    def __init__(self, out: _HashingFile):
+        self.out = out
+        self.count = 0
+
+    def write(self, entries: list):
+        chunks = []
+        for entry in entries:
+            chunks.append(("[\n    " if self.count == 0 else ",\n    ") +
+                          json.dumps(entry, indent=4).replace("\n", "\n    "))
+            self.count += 1
+        self.out.write("".join(chunks).encode("utf-8"))
+
+    def close(self):
+        self.out.write(("\n]" if self.count else "[]").encode("utf-8"))
+
+
+class _NdjsonEncoder:
+    def __init__(self, out: _HashingFile, compression: str):
+        if compression == "gzip":
+            # mtime=0 keeps the output deterministic, so equal datasets get equal hashes
+            self.stream = gzip.GzipFile(fileobj=out, mode="wb", mtime=0)
+        else:
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError("The ndjson.zst dataset format needs the zstandard package") from e
+            self.stream = zstandard.ZstdCompressor().stream_writer(out, closefd=False)
+
+    def write(self, entries: list):
+        self.stream.write("".join(json.dumps(entry, separators=(",", ":")) + "\n"
+                                  for entry in entries).encode("utf-8"))
+
+    def close(self):
+        self.stream.close()
+
+
+def flatten_entry(entry: dict) -> dict:
+    """
+    Flattens a dataset entry into one parquet row. Edges are left out, they derive from the row.
+    """
+    tweet = entry['tweet']
+    user_account = entry['user_account']
+    return {
+        "token": entry['token'],
+        "tweet_id": tweet['id'],
+        "tweet_url": tweet['url'],
+        "text": tweet['text'],
+        "likes": tweet['likes'],
+        "images": tweet['images'],
+        "timestamp": tweet['timestamp'],
+        "hashtags": entry.get('hashtags', []),
+        "user_id": user_account['user_id'],
+        "username": user_account['username'],
+        "is_verified": user_account['is_verified'],
+        "follower_count": user_account['follower_count'],
+        "account_age": user_account['account_age'],
+        "engagement_level": user_account['engagement_level'],
+        "total_tweets": user_account['total_tweets'],
+        "region": entry['region']['name'],
+    }
+
+
+class _ParquetEncoder:
+    def __init__(self, out: _HashingFile):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("The parquet dataset format needs the pyarrow package") from e
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ("token", pa.string()), ("tweet_id", pa.string()), ("tweet_url", pa.string()), ("text", pa.string()),
+            ("likes", pa.int64()), ("images", pa.list_(pa.string())), ("timestamp", pa.string()),
+            ("hashtags", pa.list_(pa.string())), ("user_id", pa.string()), ("username", pa.string()),
+            ("is_verified", pa.bool_()), ("follower_count", pa.int64()), ("account_age", pa.string()),
+            ("engagement_level", pa.int64()), ("total_tweets", pa.int64()), ("region", pa.string()),
+        ], metadata={"schema_version": SCHEMA_VERSION})
+        self.writer = pq.ParquetWriter(pa.PythonFile(out, mode="w"), self.schema, compression="zstd")
+
+    def write(self, entries: list):
+        rows = [flatten_entry(entry) for entry in entries]
+        self.writer.write_batch(self.pa.RecordBatch.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def _open_encoder(format: str, out: _HashingFile):
+    if format == "json":
+        return _JsonArrayEncoder(out)
+    if format == "ndjson.gz":
+        return _NdjsonEncoder(out, "gzip")
+    if format == "ndjson.zst":
+        return _NdjsonEncoder(out, "zstd")
+    if format == "parquet":
+        return _ParquetEncoder(out)
+    raise ValueError(f"Unknown dataset format: {format}")
+
+
+def export_dataset(entries, file_name: str, validator=None, chunk_items: int = 500, max_reject_ratio: float = 0.0,
+                   format: str = "json"):
+    """
+    Serializes dataset entries to a file one chunk of entries at a time, validating each entry before it is
+    written and hashing the bytes as they are written, so only `chunk_items` entries are held in memory at once.
+    In the legacy "json" format the file is byte-identical to `json.dump(entries, f, indent=4)`; see
+    DATASET_FORMATS for the others.
+
+    Invalid entries are left out of the dataset and written, with their errors, to `<file_name>.rejected.ndjson`.
+    The export fails when more than `max_reject_ratio` of the entries are invalid.
+
+    Args:
+        entries (iterable): Dataset entries (e.g. StagingGraph.entries()).
+        file_name (str): Path of the file to write (see dataset_file_name).
+        validator (DatasetItemValidator, optional): Validator of one entry (see load_item_validator).
+        chunk_items (int, optional): Number of entries encoded per write. Defaults to 500.
+        max_reject_ratio (float, optional): Share of invalid entries tolerated. Defaults to 0, any invalid entry
+            fails the export.
+        format (str, optional): One of DATASET_FORMATS. Defaults to "json".
+
+    Returns:
+        DatasetExport: The written file, or None when too many entries are invalid, in which case the file is
+        removed.
+    """
+    count = 0
+    rejected = 0
+    chunk = []
+    quarantine_file = f"{file_name}.rejected.ndjson"
+    quarantine = None
+
+    try:
+        with open(file_name, "wb") as file:
+            out = _HashingFile(file)
+            encoder = _open_encoder(format, out)
+            for index, entry in enumerate(entries):
+                errors = validator.errors(entry) if validator is not None else None
+                if errors:
+                    if quarantine is None:
+                        quarantine = open(quarantine_file, "w")
+                    quarantine.write(json.dumps({"index": index, "errors": errors, "entry": entry}, default=str) + "\n")
+                    rejected += 1
+                    continue
+
+                chunk.append(entry)
+                count += 1
+                if len(chunk) >= chunk_items:
+                    encoder.write(chunk)
+                    chunk = []
+            if chunk:
+                encoder.write(chunk)
+            encoder.close()
+    except BaseException:
+        if os.path.exists(file_name):
+            os.remove(file_name)  # Never leave a partial dataset behind
+        raise
+    finally:
+        if quarantine is not None:
+            quarantine.close()
+
+    total = count + rejected
+    if rejected:
+        logger.warning(f"Quarantined {rejected} invalid of {total} dataset entries in {quarantine_file}")
+        if rejected > max_reject_ratio * total:
+            logger.error(f"Rejected {rejected} of {total} dataset entries, more than the tolerated "
+                         f"{max_reject_ratio:.2%}")
+            os.remove(file_name)
+            return None
+
+    return DatasetExport(file_name, out.size, out.digest.hexdigest(), count, rejected,
+                         quarantine_file if rejected else None, format)
+
+
+# Rows of a normalized section are rejected along with the row they reference: section -> (key, referenced section)
+NORMALIZED_REFERENCES = {
+    "regions": ("name", None),
+    "users": ("user_id", ("region", "regions")),
+    "tweets": ("id", ("user_id", "users")),
+}
+
+
+def export_normalized_dataset(graph, file_name: str, validators: dict = None, chunk_items: int = 500,
+                              max_reject_ratio: float = 0.0, sections: list = None, rejected_keys: dict = None):
+    """
+    Serializes a staging graph as one compact normalized (v2) JSON document, section by section and one chunk of
+    rows at a time (see StagingGraph.normalized_sections). Every user is written and validated once however many
+    tweets they posted, so the file size and validation time no longer grow with author repetition.
+
+    Invalid rows are left out and written, with their errors, to `<file_name>.rejected.ndjson`, along with the
+    users of a rejected region and the tweets of a rejected user, so every reference in the dataset resolves. The
+    export fails when more than `max_reject_ratio` of the tweets are rejected.
+
+    Args:
+        graph (StagingGraph): The tweets to export.
+        file_name (str): Path of the file to write (see dataset_file_name).
+        validators (dict, optional): Section name -> validator of one row (see load_section_validators).
+        chunk_items (int, optional): Number of rows encoded per write. Defaults to 500.
+        max_reject_ratio (float, optional): Share of rejected tweets tolerated. Defaults to 0.
+        sections (list, optional): (section name, row iterator) pairs to write instead of all of the graph, e.g.
+            to write one part of a chunked dataset. Every section should be present, possibly empty.
+        rejected_keys (dict, optional): Section name -> keys of the rows rejected so far, updated with the rows
+            rejected here, so that rows referencing rows rejected in another part are rejected too.
+
+    Returns:
+        DatasetExport: The written file, or None when too many tweets are rejected, in which case the file is
+        removed.
+    """
+    validators = validators or {}
+    sections = graph.normalized_sections() if sections is None else sections
+    rejected_keys = {} if rejected_keys is None else rejected_keys
+    rejected_rows = {}
+    count = 0
+    rejected = 0
+    quarantine_file = f"{file_name}.rejected.ndjson"
+    quarantine = None
+
+    try:
+        with open(file_name, "wb") as file:
+            out = _HashingFile(file)
+            out.write(f'{{"schema_version":"{NORMALIZED_SCHEMA_VERSION}"'.encode("utf-8"))
+            for section, rows in sections:
+                key, reference = NORMALIZED_REFERENCES[section]
+                validator = validators.get(section)
+                section_rejected = rejected_keys.setdefault(section, set())
+                rejected_rows[section] = 0
+                written = 0
+                chunk = []
+                out.write(f',"{section}":['.encode("utf-8"))
+                for index, row in enumerate(rows):
+                    errors = validator.errors(row) if validator is not None else []
+                    if reference and row.get(reference[0]) in rejected_keys.get(reference[1], ()):
+                        errors.append(f"{reference[0]} references a rejected row of {reference[1]}")
+                    if errors:
+                        if quarantine is None:
+                            quarantine = open(quarantine_file, "w")
+                        quarantine.write(json.dumps({"section": section, "index": index, "errors": errors,
+                                                     "entry": row}, default=str) + "\n")
+                        section_rejected.add(row.get(key))
+                        rejected_rows[section] += 1
+                        continue
+
+                    chunk.append(json.dumps(row, separators=(",", ":")))
+                    if len(chunk) >= chunk_items:
+                        out.write((("," if written else "") + ",".join(chunk)).encode("utf-8"))
+                        written += len(chunk)
+                        chunk = []
+                if chunk:
+                    out.write((("," if written else "") + ",".join(chunk)).encode("utf-8"))
+                    written += len(chunk)
+                out.write(b"]")
+                if section == "tweets":
+                    count, rejected = written, rejected_rows[section]
+            out.write(b"}")
+    except BaseException:
+        if os.path.exists(file_name):
+            os.remove(file_name)  # Never leave a partial dataset behind
+        raise
+    finally:
+        if quarantine is not None:
+            quarantine.close()
+
+    total = count + rejected
+    if any(rejected_rows.values()):
+        logger.warning(f"Quarantined invalid dataset rows in {quarantine_file}: {rejected_rows}")
+        if rejected > max_reject_ratio * total:
+            logger.error(f"Rejected {rejected} of {total} tweets, more than the tolerated {max_reject_ratio:.2%}")
+            os.remove(file_name)
+            return None
+
+    return DatasetExport(file_name, out.size, out.digest.hexdigest(), count, rejected,
+                         quarantine_file if any(rejected_rows.values()) else None, "json", NORMALIZED_SCHEMA_VERSION)
@@ -0,0 +1,290 @@
+import io
+import gzip
+import json
+
+from records import Region, Tweet, TweetRecord, UserAccount
+from staging_graph import StagingGraph
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+PARQUET_MAGIC = b"PAR1"
+
+
+def detect_dataset_format(content: bytes) -> str:
+    """
+    Detects the format (see helpers.dataset_export.DATASET_FORMATS) of a dataset from its leading bytes, as
+    datasets fetched from IPFS have no file name.
+    """
+    if content.startswith(GZIP_MAGIC):
+        return "ndjson.gz"
+    if content.startswith(ZSTD_MAGIC):
+        return "ndjson.zst"
+    if content.startswith(PARQUET_MAGIC):
+        return "parquet"
+    return "json"
+
+
+def _read_ndjson(lines) -> list:
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def _entry_from_row(row: dict) -> dict:
+    return TweetRecord(
+        row["token"],
+        Tweet(row["tweet_id"], row["tweet_url"], row["text"], row["likes"], tuple(row["images"] or ()),
+              row["timestamp"]),
+        UserAccount(row["username"], row["user_id"], row["is_verified"], row["follower_count"], row["account_age"],
+                    row["engagement_level"], row["total_tweets"]),
+        Region(row["region"]),
+        tuple(row["hashtags"] or ())
+    ).to_dict()
+
+
+def parse_dataset(content: bytes):
+    """
+    Parses a dataset in any of the export formats and schema versions.
+
+    Args:
+        content (bytes): The dataset file content.
+
+    Returns:
+        list | dict: The v1 entries, or the v2 document (a dict with regions, users and tweets sections).
+    """
+    format = detect_dataset_format(content)
+    if format == "ndjson.gz":
+        with gzip.open(io.BytesIO(content), "rt", encoding="utf-8") as file:
+            return _read_ndjson(file)
+    if format == "ndjson.zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("Reading ndjson.zst datasets needs the zstandard package") from e
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(content)) as reader:
+            return _read_ndjson(io.TextIOWrapper(reader, encoding="utf-8"))
+    if format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading parquet datasets needs the pyarrow package") from e
+        return [_entry_from_row(row) for row in pq.read_table(io.BytesIO(content)).to_pylist()]
+    return json.loads(content)
+
+
+def is_normalized_dataset(dataset) -> bool:
+    return isinstance(dataset, dict) and dataset.get("schema_version") == "v2"
+
+
+def is_dataset_manifest(dataset) -> bool:
+    """
+    Whether a parsed dataset is the manifest of a chunked dataset (see helpers.dataset_chunks).
+    """
+    return is_normalized_dataset(dataset) and "chunks" in dataset
+
+
+def merge_normalized_datasets(datasets: list) -> dict:
+    """
+    Concatenates the sections of v2 datasets, e.g. the chunks of a chunked dataset.
+    """
+    merged = {"schema_version": "v2", "regions": [], "users": [], "tweets": []}
+    for dataset in datasets:
+        for section in ("regions", "users", "tweets"):
+            merged[section].extend(dataset.get(section, ()))
+    return merged
+
+
+def staging_graph_from_dataset(dataset) -> StagingGraph:
+    """
+    Builds a staging graph from a parsed v1 or v2 dataset (see parse_dataset). v2 datasets are read without
+    expanding them into per-tweet entries first.
+    """
+    if is_normalized_dataset(dataset):
+        return StagingGraph.from_normalized(dataset)
+    if not isinstance(dataset, list):
+        raise ValueError("Not a v1 or v2 dataset")
+    return StagingGraph.from_entries(dataset)
+
+
+def load_staging_graph(content: bytes) -> StagingGraph:
+    """
+    Loads a v1 or v2 dataset, in any of the export formats, into a staging graph.
+
+    Args:
+        content (bytes): The dataset file content.
+
+    Returns:
+        StagingGraph: The tweets of the dataset.
+    """
+    return staging_graph_from_dataset(parse_dataset(content))
+
+
+def load_dataset(content: bytes) -> list:
+    """
+    Loads a v1 or v2 dataset, in any of the export formats, as v1 dataset entries.
+
+    Args:
+        content (bytes): The dataset file content.
+
+    Returns:
+        list[dict]: The dataset entries.
+    """
+    dataset = parse_dataset(content)
+    if is_normalized_dataset(dataset):
+        return list(StagingGraph.from_normalized(dataset).entries())
+    return dataset
+
+
+class _JsonStream:
+    """
+    Pull parser reading the arrays and objects of a JSON document one value at a time, so that a large dataset
+    is never held in memory as a whole.
+    """
+    WHITESPACE = " \t\r\n"
+
+    def __init__(self, file, chunk_size: int = 1 << 16):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Malformed JSON dataset: expected {char!r} at {self.buffer[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _separator(self, closing: str) -> bool:
+        char = self.peek()
+        self.pos += 1
+        if char == closing:
+            return False
+        if char != ",":
+            raise ValueError(f"Malformed JSON dataset: expected ',' or {closing!r}, got {char!r}")
+        return True
+
+    def array(self):
+        """
+        Yields the values of the array at the current position.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if not self._separator("]"):
+                return
+
+    def keys(self):
+        """
+        Yields the keys of the object at the current position; the caller reads each value (value() or array()).
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if not self._separator("}"):
+                return
+
+
+def _iter_json_dataset(file):
+    stream = _JsonStream(file)
+    if stream.peek() == "[":
+        yield from stream.array()
+        return
+
+    users, regions = {}, {}
+    for key in stream.keys():
+        if key == "users":
+            for user in stream.array():
+                users[user["user_id"]] = (UserAccount.from_dict(user), user.get("region"))
+        elif key == "tweets":
+            for tweet in stream.array():
+                if tweet["user_id"] not in users:
+                    raise ValueError("The users section of a v2 dataset must precede its tweets")
+                user_account, region_name = users[tweet["user_id"]]
+                engagement_level = tweet.get("engagement_level", user_account.engagement_level)
+                if engagement_level != user_account.engagement_level:
+                    user_account = UserAccount(user_account.username, user_account.user_id, user_account.is_verified,
+                                               user_account.follower_count, user_account.account_age,
+                                               engagement_level, user_account.total_tweets)
+                region = regions.get(region_name)
+                if region is None:
+                    region = regions[region_name] = Region(region_name)
+                yield TweetRecord(tweet["token"], Tweet.from_dict(tweet), user_account, region,
+                                  tuple(tweet.get("hashtags", ())))
+        elif key == "chunks":
+            raise ValueError("Chunked dataset manifests only reference their chunks, load the chunks instead")
+        else:
+            stream.value()
+
+
+def iter_dataset_file(file_path: str):
+    """
+    Yields the tweets of a v1 or v2 dataset file, in any of the export formats, without loading the whole file:
+    compressed ndjson is read line by line, parquet by row group and JSON one value at a time.
+
+    Args:
+        file_path (str): Path of the dataset file.
+
+    Returns:
+        Iterator[dict | TweetRecord]: v1 dataset entries, or one TweetRecord per tweet of a v2 dataset.
+    """
+    with open(file_path, "rb") as file:
+        format = detect_dataset_format(file.read(4))
+
+    if format == "ndjson.gz":
+        with gzip.open(file_path, "rt", encoding="utf-8") as file:
+            yield from (json.loads(line) for line in file if line.strip())
+    elif format == "ndjson.zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("Reading ndjson.zst datasets needs the zstandard package") from e
+        with open(file_path, "rb") as raw, zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+            yield from (json.loads(line) for line in io.TextIOWrapper(reader, encoding="utf-8") if line.strip())
+    elif format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading parquet datasets needs the pyarrow package") from e
+        for batch in pq.ParquetFile(file_path).iter_batches():
+            yield from (_entry_from_row(row) for row in batch.to_pylist())
+    else:
+        with open(file_path, "r", encoding="utf-8") as file:
+            yield from _iter_json_dataset(file)
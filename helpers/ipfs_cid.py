@@ -0,0 +1,90 @@
+import hashlib
+
+# Defaults of `ipfs add` and Pinata's pinFileToIPFS: CIDv0, fixed size chunks, balanced dag-pb / UnixFS layout
+CHUNK_SIZE = 256 * 1024
+MAX_LINKS = 174
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+UNIXFS_FILE = 2
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field(number: int, data: bytes) -> bytes:
+    """
+    Length delimited protobuf field.
+    """
+    return _varint(number << 3 | 2) + _varint(len(data)) + data
+
+
+def _uint_field(number: int, value: int) -> bytes:
+    return _varint(number << 3) + _varint(value)
+
+
+def _base58(data: bytes) -> str:
+    number = int.from_bytes(data, "big")
+    encoded = ""
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + encoded
+
+
+def _dag_node(links: list, data: bytes) -> bytes:
+    """
+    dag-pb PBNode: links (multihash, Tsize) first, then the UnixFS data, as go-merkledag serializes it.
+    """
+    encoded = b"".join(_field(2, _field(1, multihash) + _field(2, b"") + _uint_field(3, tsize))
+                       for multihash, tsize in links)
+    return encoded + _field(1, data)
+
+
+def _multihash(node: bytes) -> bytes:
+    return b"\x12\x20" + hashlib.sha256(node).digest()
+
+
+def _leaf(chunk: bytes) -> tuple:
+    data = _field(2, chunk) if chunk else b""  # An empty file has no data field
+    node = _dag_node([], _uint_field(1, UNIXFS_FILE) + data + _uint_field(3, len(chunk)))
+    return _multihash(node), len(node), len(chunk)
+
+
+def _parent(children: list) -> tuple:
+    """
+    Node linking `children`, a list of (multihash, cumulative size, file size) tuples.
+    """
+    file_size = sum(size for _, _, size in children)
+    data = _uint_field(1, UNIXFS_FILE) + _uint_field(3, file_size) + b"".join(
+        _uint_field(4, size) for _, _, size in children)
+    node = _dag_node([(multihash, tsize) for multihash, tsize, _ in children], data)
+    return _multihash(node), len(node) + sum(tsize for _, tsize, _ in children), file_size
+
+
+def file_cid(file_path: str) -> str:
+    """
+    Computes the CIDv0 IPFS assigns to a file when it is added with the default settings, without uploading it.
+    Only the leaf hashes of the current tree level are kept in memory, never the file content.
+
+    Args:
+        file_path (str): Path of the file.
+
+    Returns:
+        str: The CID ("Qm...").
+    """
+    level = []
+    with open(file_path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            level.append(_leaf(chunk))
+    if not level:
+        level.append(_leaf(b""))
+
+    while len(level) > 1:
+        level = [_parent(level[start:start + MAX_LINKS]) for start in range(0, len(level), MAX_LINKS)]
+    return _base58(level[0][0])
@@ -0,0 +1,159 @@
+import os
+import random
+import asyncio
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from helpers.ipfs_utils import (IPFS_TIMEOUT, PINATA_PIN_FILE_URL, PINATA_PIN_LIST_URL, MultipartFileStream,
+                                ipfs_gateway_link)
+
+# Responses worth retrying: rate limited or a server side failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PinataClient:
+    """
+    Async client of the Pinata pinning API and IPFS gateway.
+
+    Requests run in worker threads on a single requests.Session, so the event loop never blocks on them and
+    connections are kept alive and reused from a pool sized for `max_concurrency` requests in flight. Every request
+    has a connect and a read timeout. Rate limited (429), 5xx and failed connections are retried with exponential
+    backoff and jitter, honouring Retry-After. Files are streamed from disk (see MultipartFileStream), a retry
+    re-reads the file rather than keeping it in memory.
+
+    Results are dicts of the values, or an "error".
+    """
+    def __init__(self, api_key: str, secret_api_key: str, max_concurrency: int = None, timeout: tuple = None,
+                 max_retries: int = None, backoff_secs: float = None, max_backoff_secs: float = 60,
+                 pin_file_url: str = PINATA_PIN_FILE_URL, pin_list_url: str = PINATA_PIN_LIST_URL):
+        self.api_key = api_key
+        self.secret_api_key = secret_api_key
+        self.max_concurrency = max_concurrency or int(os.getenv("IPFS_MAX_CONCURRENT_REQUESTS", 4))
+        self.timeout = timeout or IPFS_TIMEOUT
+        self.max_retries = int(os.getenv("IPFS_MAX_RETRIES", 5)) if max_retries is None else max_retries
+        self.backoff_secs = float(os.getenv("IPFS_BACKOFF_SECS", 1)) if backoff_secs is None else backoff_secs
+        self.max_backoff_secs = max_backoff_secs
+        self.pin_file_url = pin_file_url
+        self.pin_list_url = pin_list_url
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @property
+    def _auth_headers(self) -> dict:
+        return {
+            "pinata_api_key": self.api_key,
+            "pinata_secret_api_key": self.secret_api_key,
+        }
+
+    def _retry_delay(self, attempt: int, response: requests.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff_secs)
+        return min(self.backoff_secs * 2 ** attempt, self.max_backoff_secs) * random.uniform(0.5, 1)
+
+    async def _request(self, method: str, url: str, prepare=None, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying transient failures. `prepare` returns extra request arguments per attempt, e.g. a
+        fresh file stream.
+
+        Returns:
+            requests.Response: The last response, which may still be an error response.
+
+        Raises:
+            requests.exceptions.RequestException: When the last attempt failed without a response.
+        """
+        for attempt in range(self.max_retries + 1):
+            response, error = None, None
+            async with self._semaphore:
+                try:
+                    response = await asyncio.to_thread(self.session.request, method, url, timeout=self.timeout,
+                                                       **kwargs, **(prepare() if prepare else {}))
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt == self.max_retries:
+                break
+
+            # Back off outside of the semaphore, other requests may proceed meanwhile
+            delay = self._retry_delay(attempt, response)
+            reason = error or f"HTTP {response.status_code}"
+            logger.warning(f"{method} {url} failed ({reason}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        if response is not None:
+            return response
+        raise error
+
+    @staticmethod
+    def _error_detail(e: requests.exceptions.RequestException) -> str:
+        return e.response.text if e.response is not None else str(e)
+
+    async def upload_file(self, file_path: str, file_name: str = None) -> dict:
+        """
+        Upload a file on disk to IPFS, streaming it from disk.
+
+        Args:
+            file_path (str): Path of the file to upload.
+            file_name (str, optional): Name of the uploaded file. Defaults to the base name of file_path.
+
+        Returns:
+            dict: The file name, its CID ("ipfs_hash") and IPFS link, or an "error".
+        """
+        file_name = file_name or os.path.basename(file_path)
+
+        def prepare() -> dict:
+            body = MultipartFileStream(file_path, file_name)
+            headers = dict(self._auth_headers, **{
+                "Content-Type": body.content_type,
+                "Content-Length": str(len(body)),
+            })
+            return {"headers": headers, "data": body}
+
+        try:
+            response = await self._request("POST", self.pin_file_url, prepare)
+            response.raise_for_status()
+            ipfs_hash = response.json().get("IpfsHash")
+            return {"file_name": file_name, "ipfs_hash": ipfs_hash, "ipfs_link": ipfs_gateway_link(ipfs_hash)}
+        except requests.exceptions.RequestException as e:
+            return {"error": f"Failed to upload file to IPFS: {self._error_detail(e)}"}
+        except OSError as e:  # The file could not be read, e.g. it does not exist
+            return {"error": f"Failed to upload file to IPFS: {e}"}
+
+    async def is_pinned(self, ipfs_hash: str) -> dict:
+        """
+        Check whether a CID is already pinned on Pinata, so that its content need not be uploaded again.
+
+        Returns:
+            dict: Whether the CID is "pinned", or an "error".
+        """
+        params = {"hashContains": ipfs_hash, "status": "pinned", "pageLimit": 10}
+        try:
+            response = await self._request("GET", self.pin_list_url, headers=self._auth_headers, params=params)
+            response.raise_for_status()
+            rows = response.json().get("rows") or []
+            return {"pinned": any(row.get("ipfs_pin_hash") == ipfs_hash for row in rows)}
+        except requests.exceptions.RequestException as e:
+            return {"error": f"Failed to check the pin of {ipfs_hash}: {self._error_detail(e)}"}
+
+    async def download(self, ipfs_link: str) -> dict:
+        """
+        Download a file published to IPFS.
+
+        Returns:
+            dict: The file content (bytes) under "content", or an "error".
+        """
+        try:
+            response = await self._request("GET", ipfs_link)
+            response.raise_for_status()
+            return {"content": response.content}
+        except requests.exceptions.RequestException as e:
+            return {"error": f"Failed to download file from IPFS: {self._error_detail(e)}"}
+
+    async def close(self):
+        self.session.close()
@@ -1,32 +1,45 @@
-import io
-import requests
+import os
+import uuid
 
-def upload_file_to_ipfs(file_name: str, content: str, api_key: str, secret_api_key: str) -> dict:
-    """
-    Upload a file to IPFS using Pinata.
+# Overridable to point at a local fake pinning endpoint
+PINATA_API_URL = os.getenv("PINATA_API_URL", "https://api.pinata.cloud").rstrip("/")
+PINATA_PIN_FILE_URL = f"{PINATA_API_URL}/pinning/pinFileToIPFS"
+PINATA_PIN_LIST_URL = f"{PINATA_API_URL}/data/pinList"
+PINATA_GATEWAY_URL = os.getenv("PINATA_GATEWAY_URL", "https://gateway.pinata.cloud/ipfs/")
+
+# (connect, read) timeout of every IPFS request
+IPFS_TIMEOUT = (float(os.getenv("IPFS_CONNECT_TIMEOUT_SECS", 10)), float(os.getenv("IPFS_READ_TIMEOUT_SECS", 300)))
+
+
+def ipfs_gateway_link(ipfs_hash: str) -> str:
+    return f"{PINATA_GATEWAY_URL}{ipfs_hash}"
 
-    Args:
-        file_name (str): Name of the file to upload.
-        content (str): File content to upload.
-        api_key (str): Pinata API key.
-        secret_api_key (str): Pinata secret API key.
 
-    Returns:
-        dict: Response from Pinata, including the file's CID and IPFS link.
+class MultipartFileStream:
     """
-    url = "https://api.pinata.cloud/pinning/pinFileToIPFS"
-    headers = {
-        "pinata_api_key": api_key,
-        "pinata_secret_api_key": secret_api_key,
-    }
-    files = {"file": (file_name, io.BytesIO(content.encode("utf-8")))}
-
-    try:
-        response = requests.post(url, headers=headers, files=files)
-        response.raise_for_status()
-        result = response.json()
-        ipfs_hash = result.get("IpfsHash")
-        return {"file_name": file_name, "ipfs_hash": ipfs_hash, "ipfs_link": f"https://gateway.pinata.cloud/ipfs/{ipfs_hash}"}
-    except requests.exceptions.RequestException as e:
-        error_detail = e.response.text if e.response else str(e)
-        return {"error": f"Failed to upload file to IPFS: {error_detail}"}
+    multipart/form-data body with a single file field, read from disk in blocks while it is sent instead of
+    being assembled in memory. Its length is known up front, so it is sent with a Content-Length header.
+    """
+    def __init__(self, file_path: str, file_name: str = None, field_name: str = "file", block_size: int = 64 * 1024):
+        self.file_path = file_path
+        self.block_size = block_size
+        self.boundary = uuid.uuid4().hex
+        self.head = (f'--{self.boundary}\r\n'
+                     f'Content-Disposition: form-data; name="{field_name}"; '
+                     f'filename="{file_name or os.path.basename(file_path)}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n').encode("utf-8")
+        self.tail = f'\r\n--{self.boundary}--\r\n'.encode("utf-8")
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return len(self.head) + os.path.getsize(self.file_path) + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        with open(self.file_path, "rb") as file:
+            while block := file.read(self.block_size):
+                yield block
+        yield self.tail
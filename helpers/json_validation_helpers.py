@@ -1,33 +1,57 @@
 import json
-from jsonschema import validate, ValidationError
-from loguru import logger
+import functools
+from jsonschema import validators
 
-def validate_json_dataset(file_content: str, schema_path: str) -> bool:
+
+class DatasetItemValidator:
+    """
+    Validates single dataset items against the "items" subschema of a dataset schema, or of an array section of
+    it (`root` is then the whole schema, which sets the JSON schema draft).
+
+    The jsonschema validator is built once, and only describes the errors of items it found invalid.
+    """
+    def __init__(self, schema: dict, root: dict = None):
+        self.validator = validators.validator_for(root or schema)(schema["items"])
+        self.is_valid = self.validator.is_valid
+
+    def errors(self, item) -> list:
+        """
+        Returns the validation errors of an item as "message at path" strings, empty when it is valid.
+        """
+        if self.is_valid(item):
+            return []
+        return [f"{error.message} at {list(error.path)}" for error in self.validator.iter_errors(item)]
+
+
+@functools.lru_cache(maxsize=None)
+def load_item_validator(schema_path: str) -> DatasetItemValidator:
+    """
+    Returns the item validator of a dataset schema, loaded and compiled once per process.
+
+    Args:
+        schema_path (str): Path to the JSON schema file.
+
+    Returns:
+        DatasetItemValidator: Validator of one dataset item.
+    """
+    with open(schema_path, "r") as schema_file:
+        schema = json.load(schema_file)
+    return DatasetItemValidator(schema)
+
+
+@functools.lru_cache(maxsize=None)
+def load_section_validators(schema_path: str) -> dict:
     """
-    Validates a JSON dataset using a specified schema.
+    Returns the item validators of the array sections of a normalized (v2) dataset schema, loaded and compiled
+    once per process.
 
     Args:
-        file_content (str): The JSON content as a string.
         schema_path (str): Path to the JSON schema file.
 
     Returns:
-        bool: True if the dataset is valid, False otherwise.
+        dict: Section name (e.g. "users") -> DatasetItemValidator of one row of the section.
     """
-    try:
-        # Load schema
-        with open(schema_path, "r") as schema_file:
-            schema = json.load(schema_file)
-
-        # Parse JSON content
-        dataset = json.loads(file_content)
-
-        # Validate JSON against schema
-        validate(instance=dataset, schema=schema)
-        logger.info("Dataset is valid.")
-        return True
-    except ValidationError as e:
-        logger.error(f"Dataset validation error: {e.message} at {list(e.path)}")
-        return False
-    except Exception as e:
-        logger.error(f"Unexpected error during validation: {e}")
-        return False
+    with open(schema_path, "r") as schema_file:
+        schema = json.load(schema_file)
+    return {name: DatasetItemValidator(section, root=schema) for name, section in schema["properties"].items()
+            if section.get("type") == "array"}
@@ -0,0 +1,65 @@
+import time
+import threading
+import weakref
+from collections import OrderedDict
+
+# Every live TokenTTLCache of this process, so writers can invalidate a token without a reference to the readers
+_caches = weakref.WeakSet()
+
+
+class TokenTTLCache:
+    """
+    Thread-safe LRU cache with a time-to-live, for values keyed by (query name, token, parameters).
+
+    Entries expire `ttl_secs` after being stored; the least recently used entry is evicted once `maxsize`
+    entries are held. All entries of a token can be dropped with invalidate_token.
+    """
+    def __init__(self, maxsize: int = 1024, ttl_secs: float = 300):
+        self.maxsize = maxsize
+        self.ttl_secs = ttl_secs
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        _caches.add(self)
+
+    def get(self, key: tuple):
+        """
+        Returns the cached value for key, or None when it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: tuple, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_secs, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_token(self, token: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == token]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def invalidate_token(token: str):
+    """
+    Drops the cached entries of a token from every TokenTTLCache in this process. Caches of other processes are
+    not reached, GraphInfluenceReader checks the token's data version for those.
+
+    Args:
+        token (str): The token whose graph data changed.
+    """
+    for cache in list(_caches):
+        cache.invalidate_token(token)
@@ -0,0 +1,128 @@
+class Tweet:
+    __slots__ = ('id', 'url', 'text', 'likes', 'images', 'timestamp')
+
+    def __init__(self, id, url: str, text: str, likes: int, images: tuple, timestamp: str):
+        self.id = id
+        self.url = url
+        self.text = text
+        self.likes = likes
+        self.images = images
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Tweet':
+        return cls(data['id'], data['url'], data.get('text'), data['likes'], tuple(data.get('images', ())),
+                   data.get('timestamp'))
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'url': self.url,
+            'text': self.text,
+            'likes': self.likes,
+            'images': list(self.images),
+            'timestamp': self.timestamp
+        }
+
+
+class UserAccount:
+    __slots__ = ('username', 'user_id', 'is_verified', 'follower_count', 'account_age', 'engagement_level',
+                 'total_tweets')
+
+    def __init__(self, username: str, user_id, is_verified: bool, follower_count: int, account_age: str,
+                 engagement_level: int, total_tweets: int):
+        self.username = username
+        self.user_id = user_id
+        self.is_verified = is_verified
+        self.follower_count = follower_count
+        self.account_age = account_age
+        self.engagement_level = engagement_level
+        self.total_tweets = total_tweets
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'UserAccount':
+        return cls(data['username'], data['user_id'], data['is_verified'], data.get('follower_count', 0),
+                   data.get('account_age'), data.get('engagement_level', 0), data.get('total_tweets', 0))
+
+    def to_dict(self) -> dict:
+        return {
+            'username': self.username,
+            'user_id': self.user_id,
+            'is_verified': self.is_verified,
+            'follower_count': self.follower_count,
+            'account_age': self.account_age,
+            'engagement_level': self.engagement_level,
+            'total_tweets': self.total_tweets
+        }
+
+
+class Region:
+    """
+    Location of a user. Instances are immutable and shared by every record with the same location.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def to_dict(self) -> dict:
+        return {'name': self.name}
+
+
+class Edge:
+    __slots__ = ('type', 'source', 'target', 'attributes')
+
+    def __init__(self, type: str, source, target, attributes: dict = None):
+        self.type = type
+        self.source = source
+        self.target = target
+        self.attributes = attributes
+
+    def to_dict(self) -> dict:
+        edge = {'type': self.type, 'from': self.source, 'to': self.target}
+        if self.attributes is not None:
+            edge['attributes'] = self.attributes
+        return edge
+
+
+class TweetRecord:
+    """
+    One mapped tweet of a token. Its edges are not stored but derived from the tweet and user on demand, and
+    to_dict() restores the dataset entry shape (token, tweet, user_account, region, hashtags, edges).
+    """
+    __slots__ = ('token', 'tweet', 'user_account', 'region', 'hashtags')
+
+    def __init__(self, token: str, tweet: Tweet, user_account: UserAccount, region: Region, hashtags: tuple):
+        self.token = token
+        self.tweet = tweet
+        self.user_account = user_account
+        self.region = region
+        self.hashtags = hashtags
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> 'TweetRecord':
+        """
+        Build a record from a dataset entry, e.g. of a previously published dataset.
+        """
+        return cls(entry['token'], Tweet.from_dict(entry['tweet']), UserAccount.from_dict(entry['user_account']),
+                   Region(entry['region'].get('name')), tuple(entry.get('hashtags', ())))
+
+    def edges(self) -> list:
+        tweet = self.tweet
+        user_id = self.user_account.user_id
+        return [
+            Edge('POSTED', user_id, tweet.id, {'timestamp': tweet.timestamp, 'likes': tweet.likes}),
+            Edge('MENTIONS', user_id, self.token, {'timestamp': tweet.timestamp, 'hashtag_count': len(self.hashtags)}),
+            Edge('LOCATED_IN', user_id, self.region.name),
+            Edge('MENTIONED_IN', self.token, tweet.id)
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            'token': self.token,
+            'tweet': self.tweet.to_dict(),
+            'user_account': self.user_account.to_dict(),
+            'region': self.region.to_dict(),
+            'hashtags': list(self.hashtags),
+            'edges': [edge.to_dict() for edge in self.edges()]
+        }
@@ -1,228 +1,927 @@
 import os
+import csv
+import json
+import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from neo4j import GraphDatabase
 from loguru import logger
 
-class ScraperGraphIndexer:
-    def __init__(self, graph_db_url: str = None, graph_db_user: str = None, graph_db_password: str = None):
+from helpers.ttl_cache import invalidate_token
+from helpers.cypher_metrics import StatementMetrics, run_plan, run_timed
+from helpers.dataset_loader import iter_dataset_file
+from staging_graph import StagingGraph
+
+# Bulk write statements. Each one consumes a list of row maps via UNWIND so a whole batch of
+# entries is written with a single round trip per entity / relationship type.
+UPSERT_TOKENS = """
+UNWIND $rows AS row
+MERGE (t:Token {name: row.name})
+ON CREATE SET t.created_at = timestamp()
+ON MATCH SET t.updated_at = timestamp()
+"""
+
+UPSERT_REGIONS = """
+UNWIND $rows AS row
+MERGE (r:Region {name: row.name})
+ON CREATE SET r.created_at = timestamp()
+ON MATCH SET r.updated_at = timestamp()
+"""
+
+UPSERT_TWEETS = """
+UNWIND $rows AS row
+MERGE (tw:Tweet {id: row.id})
+ON CREATE SET tw.url = row.url, tw.text = row.text, tw.likes = row.likes, tw.timestamp = row.timestamp,
+    tw.fingerprint = row.fingerprint
+ON MATCH SET tw.url = row.url, tw.text = row.text, tw.likes = row.likes, tw.timestamp = row.timestamp,
+    tw.fingerprint = row.fingerprint, tw.updated_at = timestamp()
+"""
+
+UPSERT_USER_ACCOUNTS = """
+UNWIND $rows AS row
+MERGE (ua:UserAccount {user_id: row.user_id})
+ON CREATE SET 
+    ua.username = row.username,
+    ua.is_verified = row.is_verified,
+    ua.follower_count = row.follower_count,
+    ua.account_age = row.account_age,
+    ua.engagement_level = row.engagement_level,
+    ua.total_tweets = row.total_tweets,
+    ua.fingerprint = row.fingerprint,
+    ua.created_at = timestamp()
+ON MATCH SET 
+    ua.username = row.username,
+    ua.is_verified = row.is_verified,
+    ua.follower_count = row.follower_count,
+    ua.account_age = row.account_age,
+    ua.engagement_level = row.engagement_level,
+    ua.total_tweets = row.total_tweets,
+    ua.fingerprint = row.fingerprint,
+    ua.updated_at = timestamp()
+"""
+
+UPSERT_MENTIONS = """
+UNWIND $rows AS row
+MATCH (ua:UserAccount {user_id: row.user_id}), (t:Token {name: row.token_name})
+MERGE (ua)-[r:MENTIONS]->(t)
+ON CREATE SET r.timestamp = row.timestamp, r.hashtag_count = row.hashtag_count
+ON MATCH SET r.timestamp = row.timestamp, r.hashtag_count = row.hashtag_count
+"""
+
+UPSERT_POSTED = """
+UNWIND $rows AS row
+MATCH (ua:UserAccount {user_id: row.user_id}), (tw:Tweet {id: row.tweet_id})
+MERGE (ua)-[r:POSTED]->(tw)
+ON CREATE SET r.timestamp = row.timestamp, r.likes = row.likes
+ON MATCH SET r.timestamp = row.timestamp, r.likes = row.likes
+"""
+
+UPSERT_LOCATED_IN = """
+UNWIND $rows AS row
+MATCH (ua:UserAccount {user_id: row.user_id}), (r:Region {name: row.region_name})
+MERGE (ua)-[rel:LOCATED_IN]->(r)
+"""
+
+UPSERT_MENTIONED_IN = """
+UNWIND $rows AS row
+MATCH (t:Token {name: row.token_name}), (tw:Tweet {id: row.tweet_id})
+MERGE (t)-[rel:MENTIONED_IN]->(tw)
+"""
+
+# Nodes first, then relationships, so every MATCH in the edge statements finds its endpoints.
+BATCH_WRITE_STATEMENTS = [
+    ('tokens', UPSERT_TOKENS),
+    ('regions', UPSERT_REGIONS),
+    ('tweets', UPSERT_TWEETS),
+    ('user_accounts', UPSERT_USER_ACCOUNTS),
+    ('mentions', UPSERT_MENTIONS),
+    ('posted', UPSERT_POSTED),
+    ('located_in', UPSERT_LOCATED_IN),
+    ('mentioned_in', UPSERT_MENTIONED_IN),
+]
+
+# Materialized per-user, per-token influence aggregates kept on the MENTIONS relationship, so that influence
+# queries read them directly instead of traversing and summing POSTED / MENTIONED_IN at query time.
+# Aggregates are recomputed only for the users whose tweets were written in the batch.
+UPDATE_MENTION_AGGREGATES = """
+UNWIND $user_ids AS user_id
+MATCH (ua:UserAccount {user_id: user_id})-[m:MENTIONS]->(t:Token {name: $token_name})
+OPTIONAL MATCH (ua)-[:POSTED]->(tw:Tweet)<-[:MENTIONED_IN]-(t)
+WITH m, count(tw) AS mention_count, coalesce(sum(tw.likes), 0) AS total_likes,
+     max(tw.timestamp) AS last_mentioned_at
+SET m.mention_count = mention_count,
+    m.total_likes = total_likes,
+    m.engagement = CASE WHEN mention_count = 0 THEN 0.0 ELSE toFloat(total_likes) / mention_count END,
+    m.last_mentioned_at = last_mentioned_at
+"""
+
+# Ranks are relative to all users of the token, so they are refreshed once per run over the token's MENTIONS
+# relationships only, writing just the ranks that moved.
+UPDATE_INFLUENCE_RANKS = """
+MATCH (:UserAccount)-[m:MENTIONS]->(:Token {name: $token_name})
+WITH m ORDER BY coalesce(m.total_likes, 0) DESC, coalesce(m.mention_count, 0) DESC
+WITH collect(m) AS mentions
+UNWIND range(0, size(mentions) - 1) AS position
+WITH mentions[position] AS m, position + 1 AS rank
+WHERE m.rank IS NULL OR m.rank <> rank
+SET m.rank = rank
+"""
+
+# Version of a token's graph data, bumped after every indexing run of the token. Readers compare it with the
+# version their cached results were read at, so the caches of every process notice the change.
+BUMP_TOKEN_VERSION = """
+MERGE (t:Token {name: $token_name})
+SET t.data_version = coalesce(t.data_version, 0) + 1
+"""
+
+# Stored content fingerprints of the tweets / users of a batch, used to skip unchanged entities. Only
+# entities already linked to the token count as stored, so a tweet or user shared with another token
+# still gets its edges to this one.
+FETCH_TWEET_FINGERPRINTS = """
+UNWIND $ids AS id
+MATCH (tw:Tweet {id: id})<-[:MENTIONED_IN]-(:Token {name: $token_name})
+RETURN tw.id AS id, tw.fingerprint AS fingerprint
+"""
+
+FETCH_USER_FINGERPRINTS = """
+UNWIND $ids AS id
+MATCH (ua:UserAccount {user_id: id})-[:MENTIONS]->(:Token {name: $token_name})
+RETURN ua.user_id AS id, ua.fingerprint AS fingerprint
+"""
+
+# Token-scoped cleanup. Only the subgraph of the refreshed token is visited, and deletes run in
+# CALL { ... } IN TRANSACTIONS chunks (which requires auto-commit sessions, i.e. session.run).
+FIND_TOKEN_USER_IDS = """
+MATCH (ua:UserAccount)-[:MENTIONS]->(:Token {name: $scrape_token})
+RETURN ua.user_id AS user_id
+"""
+
+FIND_STALE_USER_REGIONS = """
+UNWIND $stale_user_ids AS user_id
+MATCH (:UserAccount {user_id: user_id})-[:LOCATED_IN]->(r:Region)
+RETURN DISTINCT r.name AS name
+"""
+
+DELETE_STALE_TWEETS = """
+UNWIND $stale_user_ids AS user_id
+MATCH (:UserAccount {user_id: user_id})-[:POSTED]->(tw:Tweet)<-[:MENTIONED_IN]-(:Token {name: $scrape_token})
+CALL {
+    WITH tw
+    DETACH DELETE tw
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+# Users that still mention another token only lose their MENTIONS edge to this one.
+DELETE_STALE_USER_ACCOUNTS = """
+UNWIND $stale_user_ids AS user_id
+MATCH (ua:UserAccount {user_id: user_id})-[m:MENTIONS]->(:Token {name: $scrape_token})
+CALL {
+    WITH ua, m
+    DELETE m
+    WITH ua
+    WHERE NOT EXISTS { MATCH (ua)-[:MENTIONS]->() }
+    DETACH DELETE ua
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+DELETE_ORPHANED_REGIONS = """
+UNWIND $region_names AS region_name
+MATCH (r:Region {name: region_name})
+WHERE NOT EXISTS { MATCH (:UserAccount)-[:LOCATED_IN]->(r) }
+CALL {
+    WITH r
+    DETACH DELETE r
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+# Every key used by MERGE / MATCH in the write statements, plus the Tweet.timestamp range index.
+# Entries are (name, label, property, unique); unique entries become uniqueness constraints, whose
+# backing range index also serves the lookups.
+GRAPH_SCHEMA = [
+    ('token_name_unique', 'Token', 'name', True),
+    ('tweet_id_unique', 'Tweet', 'id', True),
+    ('user_account_user_id_unique', 'UserAccount', 'user_id', True),
+    ('region_name_unique', 'Region', 'name', True),
+    ('tweet_timestamp_index', 'Tweet', 'timestamp', False),
+]
+
+
+SHOW_CONSTRAINTS = "SHOW CONSTRAINTS YIELD name, type, labelsOrTypes, properties"
+SHOW_INDEXES = "SHOW INDEXES YIELD name, state, type, labelsOrTypes, properties"
+AWAIT_INDEXES = "CALL db.awaitIndexes($timeout)"
+
+
+class GraphSchemaError(Exception):
+    """
+    Raised when the constraints and indexes required by the indexer are missing or not ONLINE.
+    """
+
+
+def _find_range_index(indexes: list, label: str, prop: str):
+    return next((i for i in indexes if i['type'] == 'RANGE' and i['labelsOrTypes'] == [label]
+                 and i['properties'] == [prop]), None)
+
+
+def plan_schema(constraints: list, indexes: list):
+    """
+    Compares GRAPH_SCHEMA with the output of SHOW CONSTRAINTS / SHOW INDEXES.
+
+    :return: Tuple of the (name, create statement) pairs still missing and the names that already exist.
+    """
+    missing, existing = [], []
+    for name, label, prop, unique in GRAPH_SCHEMA:
+        if unique:
+            present = any('UNIQUENESS' in c['type'] and c['labelsOrTypes'] == [label]
+                          and c['properties'] == [prop] for c in constraints)
+            statement = f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+        else:
+            present = _find_range_index(indexes, label, prop) is not None
+            statement = f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"
+
+        if present:
+            existing.append(name)
+        else:
+            missing.append((name, statement))
+    return missing, existing
+
+
+def check_schema_online(indexes: list):
+    """
+    :raises GraphSchemaError: If the range index backing any GRAPH_SCHEMA entry is missing or not ONLINE.
+    """
+    not_online = []
+    for name, label, prop, _ in GRAPH_SCHEMA:
+        index = _find_range_index(indexes, label, prop)
+        if index is None or index['state'] != 'ONLINE':
+            not_online.append(f"{label}.{prop} ({index['state'] if index else 'MISSING'})")
+
+    if not_online:
+        raise GraphSchemaError(f"Required graph indexes are not ONLINE: {', '.join(not_online)}")
+
+
+def fingerprint(properties: dict) -> str:
+    """
+    Returns a stable content hash of the given mapped properties.
+    """
+    payload = json.dumps(properties, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def build_graph_rows(graph: StagingGraph) -> dict:
+    """
+    Flattens a staging graph into the row lists consumed by the UNWIND statements.
+
+    :param graph: Staging graph holding deduplicated nodes and relationships.
+    :return: Dict of row lists keyed like BATCH_WRITE_STATEMENTS.
+    """
+    rows = {key: [] for key, _ in BATCH_WRITE_STATEMENTS}
+    rows['tokens'] = [{'name': name} for name in graph.tokens]
+    rows['regions'] = [{'name': name} for name in graph.regions]
+
+    for _, tweet, _, _ in graph.tweets.values():
+        tweet_row = {
+            'id': tweet.id,
+            'url': tweet.url,
+            'text': tweet.text,
+            'likes': tweet.likes,
+            'timestamp': tweet.timestamp,
+        }
+        tweet_row['fingerprint'] = fingerprint(tweet_row)
+        rows['tweets'].append(tweet_row)
+
+    for user_id, user_account in graph.users.items():
+        region_name = graph.user_regions[user_id]
+        has_region = bool(region_name) and region_name != "Unknown"
+        user_row = {
+            'user_id': user_id,
+            'username': user_account.username,
+            'is_verified': user_account.is_verified,
+            'follower_count': user_account.follower_count,
+            'account_age': user_account.account_age,
+            'engagement_level': user_account.engagement_level,
+            'total_tweets': user_account.total_tweets,
+        }
+        # The region is part of the user's fingerprint so that a changed location rewrites LOCATED_IN
+        user_row['fingerprint'] = fingerprint({**user_row, 'region': region_name if has_region else None})
+        rows['user_accounts'].append(user_row)
+
+    rows['mentions'] = [{'user_id': user_id, 'token_name': token, 'timestamp': timestamp, 'hashtag_count': count}
+                        for user_id, token, (timestamp, count) in graph.mentions]
+    rows['posted'] = [{'user_id': user_id, 'tweet_id': tweet_id, 'timestamp': timestamp, 'likes': likes}
+                      for user_id, tweet_id, (timestamp, likes) in graph.posted]
+    rows['located_in'] = [{'user_id': user_id, 'region_name': region_name}
+                          for user_id, region_name, _ in graph.located_in]
+    rows['mentioned_in'] = [{'token_name': token, 'tweet_id': tweet_id}
+                            for token, tweet_id, _ in graph.mentioned_in]
+    return rows
+
+
+def build_batch_rows(entries: list) -> dict:
+    """
+    Flattens a batch of mapped entries into deduplicated row lists (see build_graph_rows).
+
+    :param entries: List of mapped data entries (see ApiDojoTweetScraper.map_item).
+    :return: Dict of row lists keyed like BATCH_WRITE_STATEMENTS.
+    """
+    return build_graph_rows(StagingGraph.from_entries(entries))
+
+
+def select_changed_rows(rows: dict, tweet_fingerprints: dict, user_fingerprints: dict):
+    """
+    Drops the rows of a batch whose content is already stored in the graph.
+
+    Tweets and users are compared with their stored fingerprints; edges are kept when one of their endpoints is
+    new or changed (MENTIONS for every user touched by the batch, POSTED per changed tweet or author,
+    MENTIONED_IN per changed tweet, LOCATED_IN per changed user).
+
+    :param rows: Row lists produced by build_batch_rows.
+    :param tweet_fingerprints: Stored fingerprint per existing tweet id in the batch.
+    :param user_fingerprints: Stored fingerprint per existing user_id in the batch.
+    :return: Tuple of the filtered row lists and a delta dict for tweets and user accounts.
+    """
+    delta = {
+        'tweets': {'inserted': 0, 'updated': 0, 'unchanged': 0},
+        'user_accounts': {'inserted': 0, 'updated': 0, 'unchanged': 0},
+    }
+
+    def classify(entity_rows, key, stored, counts):
+        # Latest row per key wins, as it would with sequential MERGE ... ON MATCH SET
+        latest = {row[key]: row for row in entity_rows}
+        changed = {}
+        for entity_id, row in latest.items():
+            if entity_id not in stored:
+                counts['inserted'] += 1
+            elif stored[entity_id] != row['fingerprint']:
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+                continue
+            changed[entity_id] = row
+        return changed
+
+    changed_tweets = classify(rows['tweets'], 'id', tweet_fingerprints, delta['tweets'])
+    changed_users = classify(rows['user_accounts'], 'user_id', user_fingerprints, delta['user_accounts'])
+
+    posted = [row for row in rows['posted'] if row['tweet_id'] in changed_tweets or row['user_id'] in changed_users]
+    touched_users = set(changed_users) | {row['user_id'] for row in posted}
+    located_in = [row for row in rows['located_in'] if row['user_id'] in changed_users]
+    region_names = {row['region_name'] for row in located_in}
+
+    filtered = {
+        'tokens': rows['tokens'],
+        'regions': [row for row in rows['regions'] if row['name'] in region_names],
+        'tweets': list(changed_tweets.values()),
+        'user_accounts': list(changed_users.values()),
+        'mentions': [row for row in rows['mentions'] if row['user_id'] in touched_users],
+        'posted': posted,
+        'located_in': located_in,
+        'mentioned_in': [row for row in rows['mentioned_in'] if row['tweet_id'] in changed_tweets],
+    }
+    return filtered, delta
+
+
+def collect_shared_rows(graph: StagingGraph) -> dict:
+    """
+    Returns batch rows holding only the Token and Region nodes of the staging graph.
+    """
+    rows = {key: [] for key, _ in BATCH_WRITE_STATEMENTS}
+    rows['tokens'] = [{'name': name} for name in graph.tokens]
+    rows['regions'] = [{'name': name} for name in graph.regions]
+    return rows
+
+
+def new_delta(incremental: bool = True) -> dict:
+    """
+    Returns an empty delta summary. Only incremental writes compare rows with the stored fingerprints, so a full
+    write counts the written tweets and users instead of inserted / updated / unchanged ones.
+    """
+    counts = ('inserted', 'updated', 'unchanged') if incremental else ('written',)
+    return {entity: dict.fromkeys(counts + ('removed',), 0) for entity in ('tweets', 'user_accounts')}
+
+
+def merge_delta(total: dict, delta: dict):
+    """
+    Adds the counts of `delta` to `total` in place.
+    """
+    for entity, counts in delta.items():
+        for key, value in counts.items():
+            total[entity][key] += value
+
+
+def log_sampled_rows(rows: dict, sample_rate: float):
+    """
+    Logs a random sample of the written tweet rows at DEBUG level. Does nothing when the rate is 0, so the write
+    path does no per-row formatting work unless row logging is explicitly enabled.
+    """
+    if sample_rate <= 0:
+        return
+    for row in rows['tweets']:
+        if random.random() < sample_rate:
+            logger.debug("Wrote Tweet {} at {} ({} likes)", row['id'], row['timestamp'], row['likes'])
+
+
+def iter_batches(data, batch_size: int):
+    """
+    Yields consecutive lists of at most `batch_size` entries from `data`.
+    """
+    iterator = iter(data)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+# neo4j-admin database import layout: file name, header, and how to turn a batch row into a CSV record.
+# Node files carry the MERGE key as the :ID of a per-label id space, relationship files reference them.
+BULK_IMPORT_FILES = [
+    ('tokens', 'tokens.csv', ['name:ID(Token)', ':LABEL'],
+     lambda row: [row['name'], 'Token']),
+    ('regions', 'regions.csv', ['name:ID(Region)', ':LABEL'],
+     lambda row: [row['name'], 'Region']),
+    ('tweets', 'tweets.csv',
+     ['id:ID(Tweet)', 'url', 'text', 'likes:long', 'timestamp', 'fingerprint', ':LABEL'],
+     lambda row: [row['id'], row['url'], row['text'], row['likes'], row['timestamp'], row['fingerprint'], 'Tweet']),
+    ('user_accounts', 'user_accounts.csv',
+     ['user_id:ID(UserAccount)', 'username', 'is_verified:boolean', 'follower_count:long', 'account_age',
+      'engagement_level:long', 'total_tweets:long', 'fingerprint', ':LABEL'],
+     lambda row: [row['user_id'], row['username'], str(bool(row['is_verified'])).lower(), row['follower_count'],
+                  row['account_age'], row['engagement_level'], row['total_tweets'], row['fingerprint'],
+                  'UserAccount']),
+    ('mentions', 'mentions.csv',
+     [':START_ID(UserAccount)', ':END_ID(Token)', 'timestamp', 'hashtag_count:long', ':TYPE'],
+     lambda row: [row['user_id'], row['token_name'], row['timestamp'], row['hashtag_count'], 'MENTIONS']),
+    ('posted', 'posted.csv',
+     [':START_ID(UserAccount)', ':END_ID(Tweet)', 'timestamp', 'likes:long', ':TYPE'],
+     lambda row: [row['user_id'], row['tweet_id'], row['timestamp'], row['likes'], 'POSTED']),
+    ('located_in', 'located_in.csv', [':START_ID(UserAccount)', ':END_ID(Region)', ':TYPE'],
+     lambda row: [row['user_id'], row['region_name'], 'LOCATED_IN']),
+    ('mentioned_in', 'mentioned_in.csv', [':START_ID(Token)', ':END_ID(Tweet)', ':TYPE'],
+     lambda row: [row['token_name'], row['tweet_id'], 'MENTIONED_IN']),
+]
+
+# Deduplication key of every row type in the bulk import files
+BULK_IMPORT_KEYS = {
+    'tokens': lambda row: row['name'],
+    'regions': lambda row: row['name'],
+    'tweets': lambda row: row['id'],
+    'user_accounts': lambda row: row['user_id'],
+    'mentions': lambda row: (row['user_id'], row['token_name']),
+    'posted': lambda row: (row['user_id'], row['tweet_id']),
+    'located_in': lambda row: (row['user_id'], row['region_name']),
+    'mentioned_in': lambda row: (row['token_name'], row['tweet_id']),
+}
+
+
+def ensure_schema_plan(timeout_secs: int):
+    """
+    Statement plan (see helpers.cypher_metrics.run_plan) creating the constraints and indexes of GRAPH_SCHEMA
+    that are missing and waiting for them to come ONLINE.
+
+    :return: Dict with the names of the schema entries that were `created` and those that `existing`.
+    :raises GraphSchemaError: If a required index is missing or not ONLINE after waiting.
+    """
+    created = []
+    constraints, _ = yield 'schema_show_constraints', SHOW_CONSTRAINTS, None
+    indexes, _ = yield 'schema_show_indexes', SHOW_INDEXES, None
+
+    missing, existing = plan_schema([r.data() for r in constraints], [r.data() for r in indexes])
+    for name, statement in missing:
+        yield f'schema_create_{name}', statement, None
+        created.append(name)
+
+    logger.info(f"Graph schema ready: created {created or 'none'}, already existing {existing or 'none'}")
+
+    try:
+        yield 'schema_await_indexes', AWAIT_INDEXES, {'timeout': timeout_secs}
+    except Exception as e:
+        logger.warning(f"Timed out waiting for graph indexes to come online: {e}")
+
+    states, _ = yield 'schema_show_indexes', SHOW_INDEXES, None
+    check_schema_online([r.data() for r in states])
+    return {'created': created, 'existing': existing}
+
+
+def cleanup_plan(current_user_ids: list, scrape_token: str, batch_size: int):
+    """
+    Statement plan removing the token's UserAccount nodes that are not in the current scraping results, their
+    Tweets for this token, and Region nodes orphaned by their removal. Errors are logged, not raised.
+
+    :return: Counters for the removed data.
+    """
+    counters = {
+        'stale_users': 0,
+        'tweets_deleted': 0,
+        'users_deleted': 0,
+        'regions_deleted': 0,
+        'relationships_deleted': 0,
+    }
+
+    try:
+        # Step 1: Compute the users of this token that are not in the current scraping results
+        current = set(current_user_ids)
+        records, _ = yield 'cleanup_find_token_users', FIND_TOKEN_USER_IDS, {'scrape_token': scrape_token}
+        stale_user_ids = [record['user_id'] for record in records if record['user_id'] not in current]
+        counters['stale_users'] = len(stale_user_ids)
+        if not stale_user_ids:
+            logger.info(f"No stale {scrape_token} UserAccount nodes to clean up.")
+            return counters
+
+        records, _ = yield 'cleanup_find_stale_regions', FIND_STALE_USER_REGIONS, {'stale_user_ids': stale_user_ids}
+        region_names = [record['name'] for record in records]
+
+        # Step 2: Remove this token's Tweet nodes posted by the stale users
+        _, summary = yield 'cleanup_delete_tweets', DELETE_STALE_TWEETS, {
+            'stale_user_ids': stale_user_ids, 'scrape_token': scrape_token, 'batch_size': batch_size}
+        counters['tweets_deleted'] = summary.counters.nodes_deleted
+        counters['relationships_deleted'] += summary.counters.relationships_deleted
+
+        # Step 3: Remove the stale users' MENTIONS edges, and the users themselves once no token is left
+        _, summary = yield 'cleanup_delete_user_accounts', DELETE_STALE_USER_ACCOUNTS, {
+            'stale_user_ids': stale_user_ids, 'scrape_token': scrape_token, 'batch_size': batch_size}
+        counters['users_deleted'] = summary.counters.nodes_deleted
+        counters['relationships_deleted'] += summary.counters.relationships_deleted
+
+        # Step 4: Remove Region nodes the stale users were the last ones located in
+        if region_names:
+            _, summary = yield 'cleanup_delete_regions', DELETE_ORPHANED_REGIONS, {
+                'region_names': region_names, 'batch_size': batch_size}
+            counters['regions_deleted'] = summary.counters.nodes_deleted
+            counters['relationships_deleted'] += summary.counters.relationships_deleted
+
+        logger.info(f"Cleaned up old {scrape_token} data: {counters}")
+    except Exception as e:
+        logger.error("An error occurred during the cleanup process", extra={
+            "exception_type": e.__class__.__name__,
+            "exception_message": str(e),
+            "exception_args": e.args
+        })
+
+    return counters
+
+
+def update_influence_ranks_plan(scrape_token: str):
+    """
+    Statement plan re-ranking the users of a token by their materialized MENTIONS aggregates.
+    """
+    _, summary = yield 'update_influence_ranks', UPDATE_INFLUENCE_RANKS, {'token_name': scrape_token}
+    logger.info(f"Updated {summary.counters.properties_set} influence ranks for token: {scrape_token}")
+
+
+def bump_token_version_plan(scrape_token: str):
+    """
+    Statement plan marking the token's graph data as changed (see BUMP_TOKEN_VERSION). Errors are logged, not
+    raised.
+    """
+    try:
+        yield 'bump_token_version', BUMP_TOKEN_VERSION, {'token_name': scrape_token}
+    except Exception as e:
+        logger.error(f"Failed to bump the data version of token {scrape_token}", extra={
+            "exception_type": e.__class__.__name__,
+            "exception_message": str(e),
+            "exception_args": e.args
+        })
+
+
+def write_batch_plan(rows: dict, scrape_token: str, incremental: bool, log_sample_rate: float = 0):
+    """
+    Statement plan writing one batch of rows, meant to run inside a single write transaction.
+
+    :param rows: Row lists produced by build_batch_rows.
+    :param scrape_token: The token the batch is indexed for.
+    :param incremental: Only write tweets / users whose fingerprint changed, and their edges.
+    :param log_sample_rate: Share of the written tweet rows logged at DEBUG level.
+    :return: Delta counts for the batch (see select_changed_rows), or the written counts when not incremental.
+    """
+    # Influence aggregates on MENTIONS are refreshed in the same transaction for the users it wrote tweets for
+    if incremental:
+        tweet_ids = list({row['id'] for row in rows['tweets']})
+        user_ids = list({row['user_id'] for row in rows['user_accounts']})
+        records, _ = yield 'fetch_tweet_fingerprints', FETCH_TWEET_FINGERPRINTS, {
+            'ids': tweet_ids, 'token_name': scrape_token}
+        tweet_fingerprints = {record['id']: record['fingerprint'] for record in records}
+        records, _ = yield 'fetch_user_fingerprints', FETCH_USER_FINGERPRINTS, {
+            'ids': user_ids, 'token_name': scrape_token}
+        user_fingerprints = {record['id']: record['fingerprint'] for record in records}
+        rows, delta = select_changed_rows(rows, tweet_fingerprints, user_fingerprints)
+    else:
+        delta = {
+            'tweets': {'written': len({row['id'] for row in rows['tweets']})},
+            'user_accounts': {'written': len({row['user_id'] for row in rows['user_accounts']})},
+        }
+
+    for key, statement in BATCH_WRITE_STATEMENTS:
+        if rows[key]:
+            yield f'upsert_{key}', statement, {'rows': rows[key]}
+
+    touched_user_ids = list({row['user_id'] for row in rows['posted']})
+    if touched_user_ids:
+        yield 'update_mention_aggregates', UPDATE_MENTION_AGGREGATES, {
+            'user_ids': touched_user_ids, 'token_name': scrape_token}
+    log_sampled_rows(rows, log_sample_rate)
+    return delta
+
+
+def partition_rows(chunk: StagingGraph, shared_written: bool) -> dict:
+    """
+    Rows of one write transaction of a partition; Token / Region nodes are left out when they were pre-created.
+    """
+    rows = build_graph_rows(chunk)
+    if shared_written:
+        rows['tokens'], rows['regions'] = [], []
+    return rows
+
+
+class BaseScraperGraphIndexer:
+    """
+    Settings shared by ScraperGraphIndexer and AsyncScraperGraphIndexer. The Cypher they run is defined once, as
+    the statement plans above; the subclasses only add the sync or async session and transaction handling.
+    """
+    def __init__(self, graph_db_url: str = None, graph_db_user: str = None, graph_db_password: str = None,
+                 batch_size: int = None, incremental: bool = None, write_parallelism: int = None):
         self.graph_db_url = graph_db_url or os.environ.get("GRAPH_DB_URL", "bolt://localhost:7687")
         self.graph_db_user = graph_db_user or os.environ.get("GRAPH_DB_USER", "ops/neo4j")
         self.graph_db_password = graph_db_password or os.environ.get("GRAPH_DB_PASSWORD", "password")
-        self.driver = GraphDatabase.driver(self.graph_db_url, auth=(self.graph_db_user, self.graph_db_password))
+        self.batch_size = batch_size or int(os.environ.get("GRAPH_WRITE_BATCH_SIZE", 500))
+        self.incremental = incremental if incremental is not None else \
+            os.environ.get("GRAPH_INCREMENTAL_WRITES", "true").lower() == "true"
+        self.write_parallelism = write_parallelism or int(os.environ.get("GRAPH_WRITE_PARALLELISM", 1))
+        self.cleanup_batch_size = int(os.environ.get("GRAPH_CLEANUP_BATCH_SIZE", 1000))
+        self.schema_timeout_secs = int(os.environ.get("GRAPH_SCHEMA_TIMEOUT_SECS", 300))
+        self.log_sample_rate = float(os.environ.get("GRAPH_LOG_SAMPLE_RATE", 0))
+        self.metrics = StatementMetrics()
+        self._schema_ready = False
+
+    def _write_batch_plan(self, rows: dict, scrape_token: str, incremental: bool):
+        return write_batch_plan(rows, scrape_token, incremental, self.log_sample_rate)
+
+    @staticmethod
+    def _finish_delta(delta: dict, cleanup_counters: dict, scrape_token: str):
+        delta['tweets']['removed'] = cleanup_counters['tweets_deleted']
+        delta['user_accounts']['removed'] = cleanup_counters['users_deleted']
+        logger.info(f"Graph delta for token {scrape_token}: {delta}")
+
+
+class ScraperGraphIndexer(BaseScraperGraphIndexer):
+    def __init__(self, graph_db_url: str = None, graph_db_user: str = None, graph_db_password: str = None,
+                 batch_size: int = None, incremental: bool = None, write_parallelism: int = None):
+        super().__init__(graph_db_url, graph_db_user, graph_db_password, batch_size, incremental, write_parallelism)
+        self.driver = GraphDatabase.driver(
+            self.graph_db_url,
+            auth=(self.graph_db_user, self.graph_db_password),
+            max_transaction_retry_time=float(os.environ.get("GRAPH_MAX_TRANSACTION_RETRY_SECS", 30)),
+        )
 
     def close(self):
         self.driver.close()
 
-    def cleanup_old_token_data(self, current_user_ids: list, scrape_token: str):
+    @staticmethod
+    def export_bulk_import_csv(datasets, output_dir: str, batch_size: int = 1000) -> dict:
         """
-        Cleans up old data related to the given token, including UserAccount nodes not in the current scraping results,
-        their related Tweets, orphaned Region nodes, and orphaned relationships.
+        Exports one or more mapped datasets as deduplicated node and relationship CSV files in the format expected
+        by `neo4j-admin database import`, for seeding a new graph without going through MERGE statements.
+
+        Entries, and the dataset files, are streamed batch by batch to the files. The last occurrence of a node or
+        relationship wins, as it does when the datasets are indexed one after another, so pass the oldest dataset
+        first. Rows are staged as written and the superseded ones dropped once all datasets are read; only the
+        keys seen and the position of their last row are kept in memory.
+
+        :param datasets: Iterable of datasets, each either an iterable of mapped entries or the path of an
+            exported dataset file (v1 or v2, in any export format).
+        :param output_dir: Directory the CSV files are written to.
+        :param batch_size: Number of entries converted at once.
+        :return: Dict with the written file path and row count per node / relationship type.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        paths = {key: os.path.join(output_dir, file_name) for key, file_name, _, _ in BULK_IMPORT_FILES}
+        staged = {key: f"{path}.partial" for key, path in paths.items()}
+        last_row = {key: {} for key in BULK_IMPORT_KEYS}
+        counts = {}
+
+        try:
+            files, writers = {}, {}
+            try:
+                for key in paths:
+                    files[key] = open(staged[key], 'w', newline='', encoding='utf-8')
+                    writers[key] = csv.writer(files[key])
+                    counts[key] = 0
+
+                for dataset in datasets:
+                    if isinstance(dataset, (str, os.PathLike)):
+                        dataset = iter_dataset_file(dataset)
+
+                    for batch in iter_batches(dataset, batch_size):
+                        rows = build_batch_rows(batch)
+                        for key, _, _, to_record in BULK_IMPORT_FILES:
+                            row_key, positions = BULK_IMPORT_KEYS[key], last_row[key]
+                            for row in rows[key]:
+                                positions[row_key(row)] = counts[key]
+                                writers[key].writerow(to_record(row))
+                                counts[key] += 1
+            finally:
+                for f in files.values():
+                    f.close()
+
+            # Keep the last row written per key, in the order the rows were written
+            for key, _, header, _ in BULK_IMPORT_FILES:
+                keep = set(last_row.pop(key).values())
+                with open(staged[key], newline='', encoding='utf-8') as src, \
+                        open(paths[key], 'w', newline='', encoding='utf-8') as dst:
+                    writer = csv.writer(dst)
+                    writer.writerow(header)
+                    writer.writerows(record for position, record in enumerate(csv.reader(src)) if position in keep)
+                counts[key] = len(keep)
+        finally:
+            for path in staged.values():
+                if os.path.exists(path):
+                    os.remove(path)
+
+        node_args = ' '.join(f"--nodes={paths[key]}" for key in ('tokens', 'regions', 'tweets', 'user_accounts'))
+        relationship_args = ' '.join(f"--relationships={paths[key]}"
+                                     for key in ('mentions', 'posted', 'located_in', 'mentioned_in'))
+        logger.info(f"Exported bulk import files: {counts}")
+        logger.info(f"Import with: neo4j-admin database import full --multiline-fields=true "
+                    f"{node_args} {relationship_args} <database>")
+
+        return {key: {'path': paths[key], 'rows': counts[key]} for key in paths}
+
+    def ensure_schema(self) -> dict:
+        """
+        Idempotently creates the uniqueness constraints and indexes listed in GRAPH_SCHEMA and waits for them
+        to come ONLINE. Existing constraints / indexes are matched by label and property, not by name.
+
+        :return: Dict with the names of the schema entries that were `created` and those that `existing`.
+        :raises GraphSchemaError: If a required index is missing or not ONLINE after waiting.
+        """
+        with self.driver.session() as session:
+            result = run_plan(session, self.metrics, ensure_schema_plan(self.schema_timeout_secs))
+        self._schema_ready = True
+        return result
+
+    def cleanup_old_token_data(self, current_user_ids: list, scrape_token: str, batch_size: int = None) -> dict:
+        """
+        Cleans up old data related to the given token: UserAccount nodes that mention the token but are not in the
+        current scraping results, their Tweets for this token, and Region nodes orphaned by their removal.
+
+        Only the token's own subgraph is visited and deletes are committed in chunks of `batch_size` rows.
 
         :param current_user_ids: List of user_ids returned by the new scraping process.
         :param scrape_token: The token for which the data is being cleaned up.
+        :param batch_size: Rows per inner delete transaction. Defaults to GRAPH_CLEANUP_BATCH_SIZE.
+        :return: Counters for the removed data.
         """
         with self.driver.session() as session:
-            try:
-                # Step 1: Remove old UserAccount nodes not in the current scraping results
-                session.run(
-                    """
-                    MATCH (ua:UserAccount)-[:MENTIONS]->(:Token {name: $scrape_token})
-                    WHERE NOT ua.user_id IN $current_user_ids
-                    DETACH DELETE ua
-                    """,
-                    current_user_ids=current_user_ids,
-                    scrape_token=scrape_token
-                )
-                logger.info(
-                    f"Deleted old UserAccount nodes for {scrape_token} users not in the current scraping results.")
-
-                # Step 2: Remove old Tweet nodes related to the removed UserAccount nodes
-                session.run(
-                    """
-                    MATCH (tw:Tweet)<-[:POSTED]-(ua:UserAccount)
-                    WHERE NOT (ua)-[:MENTIONS]->(:Token {name: $scrape_token})
-                    DETACH DELETE tw
-                    """,
-                    scrape_token=scrape_token
-                )
-                logger.info(f"Deleted old Tweet nodes related to removed {scrape_token} UserAccount nodes.")
-
-                # Step 3: Remove orphaned Region nodes
-                session.run(
-                    """
-                    MATCH (r:Region)
-                    WHERE NOT EXISTS { MATCH (ua:UserAccount)-[:LOCATED_IN]->(r) }
-                    DETACH DELETE r
-                    """
-                )
-                logger.info(f"Deleted orphaned Region nodes without LOCATED_IN relationships.")
-
-                # Step 4: Remove orphaned relationships (not attached to valid nodes)
-                session.run(
-                    """
-                    MATCH ()-[rel]->()
-                    WHERE NOT EXISTS { MATCH (startNode)-[rel]->() }
-                       OR NOT EXISTS { MATCH ()-[rel]->(endNode) }
-                    DELETE rel
-                    """
-                )
-                logger.info(f"Deleted orphaned relationships that no longer have valid start or end nodes.")
-            except Exception as e:
-                logger.error("An error occurred during the cleanup process", extra={
-                    "exception_type": e.__class__.__name__,
-                    "exception_message": str(e),
-                    "exception_args": e.args
-                })
-
-    def create_nodes_and_edges(self, data, scrape_token: str):
+            return run_plan(session, self.metrics, cleanup_plan(current_user_ids, scrape_token,
+                                                                batch_size or self.cleanup_batch_size))
+
+    def update_influence_ranks(self, scrape_token: str):
+        """
+        Re-ranks the users of a token by their materialized MENTIONS aggregates (total likes, then mention count).
+
+        :param scrape_token: The token whose influencer ranking is refreshed.
+        """
+        with self.driver.session() as session:
+            run_plan(session, self.metrics, update_influence_ranks_plan(scrape_token))
+
+    def mark_token_changed(self, scrape_token: str):
+        """
+        Bumps the token's data version, which expires the cached reads of the token in every GraphInfluenceReader,
+        and drops them right away from the caches of this process.
+
+        :param scrape_token: The token whose graph data was written.
+        """
+        with self.driver.session() as session:
+            run_plan(session, self.metrics, bump_token_version_plan(scrape_token))
+        invalidate_token(scrape_token)
+
+    def rebuild_influence_aggregates(self, scrape_token: str):
+        """
+        Recomputes the MENTIONS aggregates of every user of a token, then their ranks. Only needed for data that was
+        not written through create_nodes_and_edges, e.g. a graph seeded with export_bulk_import_csv.
+
+        :param scrape_token: The token whose aggregates are rebuilt.
+        """
+        with self.driver.session() as session:
+            records, _ = run_timed(session, self.metrics, 'find_token_users', FIND_TOKEN_USER_IDS,
+                                   {'scrape_token': scrape_token})
+            user_ids = [record['user_id'] for record in records]
+            for batch in iter_batches(user_ids, self.batch_size):
+                run_timed(session, self.metrics, 'update_mention_aggregates', UPDATE_MENTION_AGGREGATES,
+                          {'user_ids': batch, 'token_name': scrape_token})
+        logger.info(f"Rebuilt influence aggregates of {len(user_ids)} users for token: {scrape_token}")
+        self.update_influence_ranks(scrape_token)
+
+    def _write_batch(self, tx, rows: dict, scrape_token: str, incremental: bool) -> dict:
+        """
+        Writes one batch of rows inside a single explicit transaction (see write_batch_plan).
+        """
+        return run_plan(tx, self.metrics, self._write_batch_plan(rows, scrape_token, incremental))
+
+    def _write_shared_nodes(self, graph: StagingGraph, scrape_token: str):
+        """
+        Upserts the Token and Region nodes shared by all partitions once, before the parallel phase, so that
+        workers only MATCH them instead of contending on their write locks.
+        """
+        shared = collect_shared_rows(graph)
+        with self.driver.session() as session:
+            session.execute_write(self._write_batch, shared, scrape_token, False)
+        logger.info(f"Pre-created {len(shared['tokens'])} Token and {len(shared['regions'])} Region nodes")
+
+    def _write_partition(self, graph: StagingGraph, scrape_token: str, batch_size: int,
+                         shared_written: bool = False):
+        """
+        Writes a staging graph chunk by chunk through its own session.
+
+        :param graph: Staging graph of the partition.
+        :param scrape_token: The token for which the data is being indexed.
+        :param batch_size: Number of entries per write transaction.
+        :param shared_written: Token / Region nodes were already pre-created and are left out of the batches.
+        :return: Tuple of the partition's delta counts and the user_ids it wrote.
+        """
+        delta = new_delta(self.incremental)
+        user_ids = []
+        processed = 0
+
+        with self.driver.session() as session:
+            for chunk in graph.chunks(batch_size):
+                rows = partition_rows(chunk, shared_written)
+                # Collect current user IDs for cleanup
+                user_ids.extend(chunk.users)
+
+                # execute_write retries deadlocks and other transient errors with backoff
+                merge_delta(delta, session.execute_write(self._write_batch, rows, scrape_token, self.incremental))
+                processed += len(chunk)
+                logger.debug("Wrote batch of {} tweets ({}/{}) for token: {}",
+                             len(chunk), processed, len(graph), scrape_token)
+
+        return delta, user_ids
+
+    def create_nodes_and_edges(self, data, scrape_token: str, batch_size: int = None) -> dict:
         """
         Creates nodes and edges in the graph database based on the scraped data and cleans up old data.
 
-        :param data: List of scraped data entries.
+        The entries are first deduplicated into a staging graph, which is written in batches of users and their
+        tweets: every batch is flattened into per-type row lists and written with one UNWIND statement per entity
+        and relationship type, all in a single transaction. In incremental mode
+        tweets and users whose content fingerprint is unchanged since the last run are skipped.
+
+        With a write parallelism above 1 the staging graph is partitioned by user_id and every partition is written
+        through its own session in a thread pool, after the shared Token / Region nodes have been pre-created.
+
+        :param data: List of scraped data entries, or a StagingGraph built from them.
         :param scrape_token: The token for which the data is being indexed and cleaned.
+        :param batch_size: Approximate number of tweets per write transaction. Defaults to GRAPH_WRITE_BATCH_SIZE.
+        :return: Delta summary with inserted / updated / unchanged / removed counts for tweets and user accounts,
+            or written / removed counts when not incremental (see new_delta).
+            Per-statement timings and counters of the run are logged and kept in `self.metrics`.
+        :raises Exception: The error of a failed write, once the token's cached reads were invalidated.
         """
-        with self.driver.session() as session:
-            try:
-                current_user_ids = []  # Keep track of user_ids from the new scraping process
-
-                for entry in data:
-                    token = entry['token']
-                    tweet = entry['tweet']
-                    user_account = entry['user_account']
-                    region = entry['region']
-                    edges = entry['edges']
-
-                    # Upsert Token node
-                    session.run(
-                        """
-                        MERGE (t:Token {name: $token_name})
-                        ON CREATE SET t.created_at = timestamp()
-                        ON MATCH SET t.updated_at = timestamp()
-                        """,
-                        token_name=token
-                    )
-                    logger.debug(f"Processed Token node for: {token}")
-
-                    # Upsert Tweet node
-                    session.run(
-                        """
-                        MERGE (tw:Tweet {id: $tweet_id})
-                        ON CREATE SET tw.url = $url, tw.text = $text, tw.likes = $likes, tw.timestamp = $timestamp
-                        ON MATCH SET tw.url = $url, tw.text = $text, tw.likes = $likes, tw.timestamp = $timestamp, tw.updated_at = timestamp()
-                        """,
-                        tweet_id=tweet['id'], url=tweet['url'], text=tweet['text'], likes=tweet['likes'],
-                        timestamp=tweet['timestamp']
-                    )
-                    logger.debug(f"Processed Tweet node for ID: {tweet['id']}")
-
-                    # Upsert UserAccount node with `total_tweets`
-                    session.run(
-                        """
-                        MERGE (ua:UserAccount {user_id: $user_id})
-                        ON CREATE SET 
-                            ua.username = $username,
-                            ua.is_verified = $is_verified,
-                            ua.follower_count = $follower_count,
-                            ua.account_age = $account_age,
-                            ua.engagement_level = $engagement_level,
-                            ua.total_tweets = $total_tweets,
-                            ua.created_at = timestamp()
-                        ON MATCH SET 
-                            ua.username = $username,
-                            ua.is_verified = $is_verified,
-                            ua.follower_count = $follower_count,
-                            ua.account_age = $account_age,
-                            ua.engagement_level = $engagement_level,
-                            ua.total_tweets = $total_tweets,
-                            ua.updated_at = timestamp()
-                        """,
-                        user_id=user_account['user_id'],
-                        username=user_account['username'],
-                        is_verified=user_account['is_verified'],
-                        follower_count=user_account.get('follower_count', 0),
-                        account_age=user_account.get('account_age', 0),
-                        engagement_level=user_account.get('engagement_level', 0.0),
-                        total_tweets=user_account.get('total_tweets', 0)  # New field with a default value
-                    )
-                    logger.debug(f"Processed UserAccount node for user_id: {user_account['user_id']}")
-
-                    # Collect current user IDs for cleanup
-                    current_user_ids.append(user_account['user_id'])
-
-                    # Upsert Region node
-                    if region.get('name') and region['name'] != "Unknown":
-                        session.run(
-                            """
-                            MERGE (r:Region {name: $region_name})
-                            ON CREATE SET r.created_at = timestamp()
-                            ON MATCH SET r.updated_at = timestamp()
-                            """,
-                            region_name=region['name']
-                        )
-                        logger.debug(f"Processed Region node for: {region['name']}")
-
-                    # Upsert relationships
-                    for edge in edges:
-                        if edge['type'] == 'MENTIONS':
-                            session.run(
-                                """
-                                MATCH (ua:UserAccount {user_id: $user_id}), (t:Token {name: $token_name})
-                                MERGE (ua)-[r:MENTIONS]->(t)
-                                ON CREATE SET r.timestamp = $timestamp, r.hashtag_count = $hashtag_count
-                                ON MATCH SET r.timestamp = $timestamp, r.hashtag_count = $hashtag_count
-                                """,
-                                user_id=user_account['user_id'], token_name=token,
-                                timestamp=edge['attributes']['timestamp'],
-                                hashtag_count=edge['attributes']['hashtag_count']
-                            )
-                            logger.debug(
-                                f"Processed MENTIONS relationship for UserAccount {user_account['user_id']} and Token {token}")
-
-                        elif edge['type'] == 'POSTED':
-                            session.run(
-                                """
-                                MATCH (ua:UserAccount {user_id: $user_id}), (tw:Tweet {id: $tweet_id})
-                                MERGE (ua)-[r:POSTED]->(tw)
-                                ON CREATE SET r.timestamp = $timestamp, r.likes = $likes
-                                ON MATCH SET r.timestamp = $timestamp, r.likes = $likes
-                                """,
-                                user_id=user_account['user_id'], tweet_id=tweet['id'],
-                                timestamp=edge['attributes']['timestamp'], likes=edge['attributes']['likes']
-                            )
-                            logger.debug(
-                                f"Processed POSTED relationship for UserAccount {user_account['user_id']} and Tweet {tweet['id']}")
-
-                        elif edge['type'] == 'LOCATED_IN' and region.get('name') != "Unknown":
-                            session.run(
-                                """
-                                MATCH (ua:UserAccount {user_id: $user_id}), (r:Region {name: $region_name})
-                                MERGE (ua)-[rel:LOCATED_IN]->(r)
-                                """,
-                                user_id=user_account['user_id'], region_name=region['name']
-                            )
-                            logger.debug(
-                                f"Processed LOCATED_IN relationship for UserAccount {user_account['user_id']} and Region {region['name']}")
-
-                        elif edge['type'] == 'MENTIONED_IN':
-                            session.run(
-                                """
-                                MATCH (t:Token {name: $token_name}), (tw:Tweet {id: $tweet_id})
-                                MERGE (t)-[rel:MENTIONED_IN]->(tw)
-                                """,
-                                token_name=token, tweet_id=tweet['id']
-                            )
-                            logger.debug(
-                                f"Processed MENTIONED_IN relationship for Token {token} and Tweet {tweet['id']}")
-
-                    # Log progress for the current entry
-                    logger.info(f"Finished processing entry for user_id: {user_account['user_id']}")
-
-                # Cleanup old token data after processing all new data
-                self.cleanup_old_token_data(current_user_ids, scrape_token)
-                logger.info(f"Completed cleanup for old data related to token: {scrape_token}")
-
-            except Exception as e:
-                logger.error("An error occurred while creating nodes and edges", extra={
-                    "exception_type": e.__class__.__name__,
-                    "exception_message": str(e),
-                    "exception_args": e.args
-                })
+        batch_size = batch_size or self.batch_size
+        self.metrics.reset()
+        if not self._schema_ready:
+            self.ensure_schema()
+
+        graph = data if isinstance(data, StagingGraph) else StagingGraph.from_entries(data)
+        delta = new_delta(self.incremental)
+
+        try:
+            current_user_ids = []  # Keep track of user_ids from the new scraping process
+
+            if self.write_parallelism > 1:
+                self._write_shared_nodes(graph, scrape_token)
+                partitions = [p for p in graph.partition(self.write_parallelism) if len(p)]
+                logger.info(f"Writing {len(graph)} tweets for token {scrape_token} in {len(partitions)} partitions")
+
+                with ThreadPoolExecutor(max_workers=self.write_parallelism) as pool:
+                    futures = [pool.submit(self._write_partition, partition, scrape_token, batch_size, True)
+                               for partition in partitions]
+                    results = [future.result() for future in futures]
+            else:
+                results = [self._write_partition(graph, scrape_token, batch_size)]
+
+            for partition_delta, user_ids in results:
+                merge_delta(delta, partition_delta)
+                current_user_ids.extend(user_ids)
+
+            # Cleanup old token data after processing all new data
+            cleanup_counters = self.cleanup_old_token_data(current_user_ids, scrape_token)
+            logger.info(f"Completed cleanup for old data related to token: {scrape_token}: {cleanup_counters}")
+
+            self._finish_delta(delta, cleanup_counters, scrape_token)
+
+            self.update_influence_ranks(scrape_token)
+            logger.info(f"Graph statement metrics for token {scrape_token}: {self.metrics.summary()}")
+
+        except Exception as e:
+            logger.error("An error occurred while creating nodes and edges", extra={
+                "exception_type": e.__class__.__name__,
+                "exception_message": str(e),
+                "exception_args": e.args
+            })
+            raise
+        finally:
+            # Cached influence reads of this token are stale now, even if the run failed half way
+            self.mark_token_changed(scrape_token)
+
+        return delta
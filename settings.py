@@ -10,7 +10,10 @@ class Settings(BaseSettings):
 
     SCRAPE_START_DATE: str
     MAX_ITEMS: int
-    SCRAPE_TOKEN: str
+    SCRAPE_TOKEN: str = ""
+    SCRAPE_TOKENS: str = ""  # Comma separated, takes precedence over SCRAPE_TOKEN
+    INDEXER_CONCURRENCY: int = 4
+    SCRAPE_OVERLAP_HOURS: int = 24  # Re-scraped before the watermark, to catch late or edited tweets
     INDEXER_INTERVAL_HOURS: int
     TRIGGER_IMMEDIATE: bool
     PINATA_API_KEY: str
@@ -25,6 +28,12 @@ class Settings(BaseSettings):
 
     REDIS_URL: str
 
+    GRAPH_INDEXING_ENABLED: bool = False
+    DATASET_FORMAT: str = "json"  # json, ndjson.gz, ndjson.zst or parquet (see requirements-formats.txt)
+    DATASET_SCHEMA_VERSION: str = "v1"  # v1 (one entry per tweet) or v2 (normalized, json format only)
+    DATASET_CHUNKED: bool = False  # Publish v2 chunks per day plus a manifest, ignores the two settings above
+    MAX_REJECT_RATIO: float = 0.01  # Share of invalid tweets quarantined before a dataset is rejected as a whole
+
     DB_URL_OBJ: URL = URL.create(
         "postgresql+asyncpg",
         username=os.environ.get("POSTGRES_USER"),
@@ -38,5 +47,19 @@ class Settings(BaseSettings):
     PROJECT_ROOT: Path = Path(__file__).parent.parent.resolve()
     model_config = SettingsConfigDict(env_file=".env", extra='allow')
 
+    def get_scrape_tokens(self) -> list:
+        """
+        Returns the tokens to index: SCRAPE_TOKENS, or else SCRAPE_TOKEN.
+
+        Raises:
+            ValueError: When neither is configured.
+        """
+        tokens = [token.strip() for token in self.SCRAPE_TOKENS.split(",") if token.strip()]
+        if not tokens and self.SCRAPE_TOKEN.strip():
+            tokens = [self.SCRAPE_TOKEN.strip()]
+        if not tokens:
+            raise ValueError("No token to index, set SCRAPE_TOKENS or SCRAPE_TOKEN")
+        return tokens
+
 
 settings = Settings()
@@ -0,0 +1,241 @@
+import zlib
+
+from records import Region, Tweet, TweetRecord, UserAccount
+
+
+class EdgeList:
+    """
+    Relationships of one type stored as parallel source / target id arrays, deduplicated by id pair.
+    Re-adding an existing pair replaces its attributes, so the latest value wins.
+    """
+    __slots__ = ('sources', 'targets', 'attributes', '_index')
+
+    def __init__(self):
+        self.sources = []
+        self.targets = []
+        self.attributes = []
+        self._index = {}
+
+    def add(self, source, target, attributes: tuple = None):
+        position = self._index.get((source, target))
+        if position is None:
+            self._index[(source, target)] = len(self.sources)
+            self.sources.append(source)
+            self.targets.append(target)
+            self.attributes.append(attributes)
+        else:
+            self.attributes[position] = attributes
+
+    def __len__(self):
+        return len(self.sources)
+
+    def __iter__(self):
+        return zip(self.sources, self.targets, self.attributes)
+
+
+class StagingGraph:
+    """
+    Normalized, in-memory form of the mapped scraper output.
+
+    Tokens, regions, users and tweets are deduplicated by key, keeping the latest value per key, and every
+    relationship type is kept as an EdgeList instead of per-tweet edge dicts. The graph writer, the JSON exporter
+    and the validation step consume it; `entries()` restores the legacy per-tweet entry shape.
+
+    A user's engagement_level is that of the tweet it was scraped with (its likes and retweets), so it is kept
+    per tweet and only the user's other fields are collapsed to their latest value.
+    """
+    def __init__(self):
+        self.tokens = {}        # name -> None
+        self.regions = {}       # name -> None, only real locations ("Unknown" / empty are not nodes)
+        self.users = {}         # user_id -> UserAccount
+        self.user_regions = {}  # user_id -> region name as scraped
+        self.tweets = {}        # tweet id -> (token, Tweet, user_id, hashtags)
+        self.engagement = {}    # tweet id -> engagement_level of the user account scraped with the tweet
+
+        self.mentions = EdgeList()      # user_id -> token, (timestamp, hashtag_count)
+        self.posted = EdgeList()        # user_id -> tweet id, (timestamp, likes)
+        self.located_in = EdgeList()    # user_id -> region name
+        self.mentioned_in = EdgeList()  # token -> tweet id
+
+    @classmethod
+    def from_entries(cls, entries) -> 'StagingGraph':
+        """
+        Build a staging graph from TweetRecords (see ApiDojoTweetScraper.map_item) or dataset entries.
+        """
+        graph = cls()
+        for entry in entries:
+            graph.add_entry(entry)
+        return graph
+
+    @classmethod
+    def from_normalized(cls, dataset: dict) -> 'StagingGraph':
+        """
+        Build a staging graph from a normalized (v2) dataset, see `normalized_sections()`.
+        """
+        graph = cls()
+        user_regions = {}
+        for user in dataset['users']:
+            user_regions[user['user_id']] = (UserAccount.from_dict(user), user.get('region'))
+        for tweet in dataset['tweets']:
+            user_account, region_name = user_regions[tweet['user_id']]
+            graph._add(tweet['token'], Tweet.from_dict(tweet), user_account, region_name,
+                       tuple(tweet.get('hashtags', ())), tweet.get('engagement_level'))
+        return graph
+
+    def add_entry(self, entry):
+        if isinstance(entry, dict):
+            entry = TweetRecord.from_dict(entry)
+        self._add(entry.token, entry.tweet, entry.user_account, entry.region.name, entry.hashtags)
+
+    def _add(self, token: str, tweet, user_account, region_name: str, hashtags: tuple, engagement_level=None):
+        user_id = user_account.user_id
+        tweet_id = tweet.id
+
+        self.tokens[token] = None
+        self.users[user_id] = user_account
+        self.user_regions[user_id] = region_name
+        self.tweets[tweet_id] = (token, tweet, user_id, hashtags)
+        self.engagement[tweet_id] = user_account.engagement_level if engagement_level is None else engagement_level
+
+        self.mentions.add(user_id, token, (tweet.timestamp, len(hashtags)))
+        self.posted.add(user_id, tweet_id, (tweet.timestamp, tweet.likes))
+        self.mentioned_in.add(token, tweet_id)
+        if region_name and region_name != "Unknown":
+            self.regions[region_name] = None
+            self.located_in.add(user_id, region_name)
+
+    def __len__(self):
+        return len(self.tweets)
+
+    def latest_tweet(self):
+        """
+        Returns (timestamp, tweet id) of the newest tweet, or None when no tweet has a timestamp.
+        """
+        latest = None
+        for tweet_id, (_, tweet, _, _) in self.tweets.items():
+            if tweet.timestamp and (latest is None or tweet.timestamp > latest[0]):
+                latest = (tweet.timestamp, tweet_id)
+        return latest
+
+    def _tweet_user_account(self, tweet_id, user_id) -> UserAccount:
+        """
+        Returns the latest account of the user, with the engagement_level of the given tweet.
+        """
+        user_account = self.users[user_id]
+        engagement_level = self.engagement[tweet_id]
+        if engagement_level == user_account.engagement_level:
+            return user_account
+        return UserAccount(user_account.username, user_id, user_account.is_verified, user_account.follower_count,
+                           user_account.account_age, engagement_level, user_account.total_tweets)
+
+    def records(self):
+        """
+        Yields one TweetRecord per tweet, using the latest value of each user and the engagement of the tweet.
+        """
+        regions = {}
+        for tweet_id, (token, tweet, user_id, hashtags) in self.tweets.items():
+            region_name = self.user_regions[user_id]
+            region = regions.get(region_name)
+            if region is None:
+                region = regions[region_name] = Region(region_name)
+            yield TweetRecord(token, tweet, self._tweet_user_account(tweet_id, user_id), region, hashtags)
+
+    def entries(self):
+        """
+        Yields one entry per tweet in the dataset shape (token, tweet, user_account, region, hashtags, edges),
+        using the latest value of each user and the engagement of the tweet.
+        """
+        for record in self.records():
+            yield record.to_dict()
+
+    def region_rows(self):
+        """
+        Yields the regions of the normalized (v2) dataset, one per distinct user location, "Unknown" included,
+        ordered by name.
+        """
+        for region_name in sorted(set(self.user_regions.values()), key=str):
+            yield {'name': region_name}
+
+    def user_rows(self):
+        """
+        Yields the users of the normalized (v2) dataset: the latest user account, referencing its region by name,
+        ordered by user_id so that the same users always serialize the same, however they were added.
+        """
+        for user_id in sorted(self.users, key=str):
+            user_account = self.users[user_id]
+            user = user_account.to_dict()
+            user['region'] = self.user_regions[user_id]
+            yield user
+
+    def tweet_rows(self, tweet_ids=None):
+        """
+        Yields the tweets (all, or those of `tweet_ids`) of the normalized (v2) dataset, referencing their author
+        by user_id and carrying the author's engagement_level for that tweet. Edges are left out, they derive from
+        the tweet and its author.
+        """
+        for tweet_id in (self.tweets if tweet_ids is None else tweet_ids):
+            token, tweet, user_id, hashtags = self.tweets[tweet_id]
+            row = tweet.to_dict()
+            row['token'] = token
+            row['user_id'] = user_id
+            row['hashtags'] = list(hashtags)
+            row['engagement_level'] = self.engagement[tweet_id]
+            yield row
+
+    def normalized_sections(self) -> list:
+        """
+        Returns the (section name, row iterator) pairs of the normalized (v2) dataset layout, in file order.
+        """
+        return [('regions', self.region_rows()), ('users', self.user_rows()), ('tweets', self.tweet_rows())]
+
+    def tweets_by_day(self) -> dict:
+        """
+        Returns the ids of the tweets posted on each UTC day ("YYYY-MM-DD", "undated" without a timestamp), in
+        day order and ordered by timestamp and id within a day, so an unchanged day always lists the same tweets
+        in the same order.
+        """
+        days = {}
+        for tweet_id, (_, tweet, _, _) in self.tweets.items():
+            days.setdefault(tweet.timestamp[:10] if tweet.timestamp else "undated", []).append(
+                (tweet.timestamp or "", str(tweet_id), tweet_id))
+        return {day: [tweet_id for _, _, tweet_id in sorted(days[day])] for day in sorted(days)}
+
+    def _tweets_by_user(self) -> dict:
+        by_user = {}
+        for tweet_id, (_, _, user_id, _) in self.tweets.items():
+            by_user.setdefault(user_id, []).append(tweet_id)
+        return by_user
+
+    def _subgraph(self, user_tweets: dict) -> 'StagingGraph':
+        subgraph = StagingGraph()
+        for user_id, tweet_ids in user_tweets.items():
+            for tweet_id in tweet_ids:
+                token, tweet, _, hashtags = self.tweets[tweet_id]
+                subgraph._add(token, tweet, self.users[user_id], self.user_regions[user_id], hashtags,
+                              self.engagement[tweet_id])
+        return subgraph
+
+    def chunks(self, size: int):
+        """
+        Yields subgraphs of roughly `size` tweets. A user and all of their tweets always end up in the same chunk,
+        so no user is written twice.
+        """
+        current, count = {}, 0
+        for user_id, tweet_ids in self._tweets_by_user().items():
+            if current and count + len(tweet_ids) > size:
+                yield self._subgraph(current)
+                current, count = {}, 0
+            current[user_id] = tweet_ids
+            count += len(tweet_ids)
+        if current:
+            yield self._subgraph(current)
+
+    def partition(self, partitions: int) -> list:
+        """
+        Splits the graph into `partitions` subgraphs by a stable hash of user_id, so that parallel writers never
+        touch the same user or tweet nodes.
+        """
+        buckets = [{} for _ in range(partitions)]
+        for user_id, tweet_ids in self._tweets_by_user().items():
+            buckets[zlib.crc32(str(user_id).encode('utf-8')) % partitions][user_id] = tweet_ids
+        return [self._subgraph(bucket) for bucket in buckets]
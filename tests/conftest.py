@@ -0,0 +1,28 @@
+import pytest
+
+from records import Region, Tweet, TweetRecord, UserAccount
+
+
+def make_entries(tweets: int = 60, users: int = 7) -> list:
+    """
+    Dataset entries of a token; users post several tweets, each with its own engagement_level.
+    """
+    entries = []
+    for i in range(tweets):
+        user = i % users
+        record = TweetRecord(
+            "TAO",
+            Tweet(str(1000 + i), f"https://x.com/u{user}/status/{1000 + i}", f"tweet {i}", i, (),
+                  f"2024-10-{1 + i % 5:02d}T12:00:00Z"),
+            UserAccount(f"u{user}", str(user), user % 2 == 0, 10 * user, "2017-01-02T10:00:00Z", 3 * i + 1,
+                        100 + user),
+            Region(["Berlin", "Unknown", ""][user % 3]),
+            ("tao",) * (i % 3),
+        )
+        entries.append(record.to_dict())
+    return entries
+
+
+@pytest.fixture
+def entries() -> list:
+    return make_entries()
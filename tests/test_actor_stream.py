@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from apify.actor_backends import FakeActorBackend
+from apify.actors import ActorConfig, run_actor_async, stream_actor_async
+
+
+@pytest.fixture(autouse=True)
+def no_actor_cache(monkeypatch):
+    monkeypatch.delenv("APIFY_CACHE_DIR", raising=False)
+    monkeypatch.delenv("APIFY_REPLAY", raising=False)
+
+
+async def stream_items(backend: FakeActorBackend, **kwargs) -> list:
+    items = []
+    async for page in stream_actor_async(ActorConfig("fake"), {"maxItems": backend.total_items}, backend=backend,
+                                         poll_interval_secs=0.01, **kwargs):
+        items.extend(page)
+    return items
+
+
+@pytest.mark.parametrize("max_parallel_pages", [1, 4])
+def test_stream_reads_past_a_server_page_cap(max_parallel_pages):
+    backend = FakeActorBackend(total_items=1500, latency_secs=0, page_size=500)
+    items = asyncio.run(stream_items(backend, page_size=1000, max_parallel_pages=max_parallel_pages))
+    assert len(items) == 1500
+    assert len({item["id"] for item in items}) == 1500
+
+
+def test_stream_reads_past_a_server_page_cap_while_running():
+    backend = FakeActorBackend(total_items=1500, latency_secs=0, page_size=500, items_per_sec=10000)
+    items = asyncio.run(stream_items(backend, page_size=1000))
+    assert len({item["id"] for item in items}) == 1500
+
+
+def test_run_reads_past_a_server_page_cap():
+    backend = FakeActorBackend(total_items=1500, latency_secs=0, page_size=500)
+    items = asyncio.run(run_actor_async(ActorConfig("fake"), {"maxItems": 1500}, backend=backend))
+    assert len({item["id"] for item in items}) == 1500
+
+
+class FailingActorBackend(FakeActorBackend):
+    def _run(self, run_id: str) -> dict:
+        return dict(super()._run(run_id), status="FAILED")
+
+
+async def stream_and_run(backend: FakeActorBackend) -> tuple:
+    streamed = await stream_items(backend)
+    fetched = await run_actor_async(ActorConfig("fake"), {"maxItems": backend.total_items}, backend=backend)
+    return streamed, fetched
+
+
+@pytest.mark.parametrize("backend_class, cached", [(FakeActorBackend, True), (FailingActorBackend, False)])
+def test_only_succeeded_runs_are_cached(monkeypatch, tmp_path, backend_class, cached):
+    monkeypatch.setenv("APIFY_CACHE_DIR", str(tmp_path))
+    backend = backend_class(total_items=100, latency_secs=0)
+    streamed, fetched = asyncio.run(stream_and_run(backend))
+    assert len(streamed) == len(fetched) == 100
+    assert bool(list(tmp_path.glob("*.ndjson.gz"))) is cached
+    assert not list(tmp_path.glob("*.tmp"))
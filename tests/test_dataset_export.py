@@ -0,0 +1,46 @@
+import hashlib
+
+import pytest
+
+from helpers.dataset_export import dataset_file_name, export_dataset
+from helpers.dataset_loader import iter_dataset_file, load_dataset
+from staging_graph import StagingGraph
+
+
+def round_trip(entries, tmp_path, format: str) -> list:
+    file_name = dataset_file_name(str(tmp_path / "dataset"), format)
+    dataset = export_dataset(iter(entries), file_name, format=format)
+    with open(file_name, "rb") as file:
+        content = file.read()
+    assert dataset.items == len(entries)
+    assert (dataset.size, dataset.sha256) == (len(content), hashlib.sha256(content).hexdigest())
+    assert list(StagingGraph.from_entries(iter_dataset_file(file_name)).entries()) == entries
+    return load_dataset(content)
+
+
+@pytest.mark.parametrize("format", ["json", "ndjson.gz"])
+def test_round_trip(entries, tmp_path, format):
+    assert round_trip(entries, tmp_path, format) == entries
+
+
+def test_zstd_round_trip(entries, tmp_path):
+    pytest.importorskip("zstandard")
+    assert round_trip(entries, tmp_path, "ndjson.zst") == entries
+
+
+def test_parquet_round_trip(entries, tmp_path):
+    pytest.importorskip("pyarrow")
+    assert round_trip(entries, tmp_path, "parquet") == entries
+
+
+def test_hashing_file_closes_through_pyarrow(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    from helpers.dataset_export import _HashingFile
+
+    with open(tmp_path / "out.bin", "wb") as file:
+        out = _HashingFile(file)
+        sink = pa.PythonFile(out, mode="w")
+        sink.write(b"data")
+        sink.close()
+        assert out.closed and not file.closed
+        assert out.size == 4
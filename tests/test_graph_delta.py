@@ -0,0 +1,58 @@
+from scraper_graph_indexer import build_graph_rows, select_changed_rows, write_batch_plan
+from staging_graph import StagingGraph
+
+
+def stored_fingerprints(rows: dict) -> tuple:
+    return ({row['id']: row['fingerprint'] for row in rows['tweets']},
+            {row['user_id']: row['fingerprint'] for row in rows['user_accounts']})
+
+
+def test_select_changed_rows_classifies_new_changed_and_unchanged(entries):
+    stored_tweets, stored_users = stored_fingerprints(build_graph_rows(StagingGraph.from_entries(entries)))
+
+    entries[0]['tweet']['likes'] += 1             # Changed tweet of user 0
+    del stored_tweets[entries[2]['tweet']['id']]  # New tweet of user 2
+    del stored_users['3']                         # New user 3
+    for entry in entries:                         # Changed user 1
+        if entry['user_account']['user_id'] == '1':
+            entry['user_account']['follower_count'] += 1
+    rows = build_graph_rows(StagingGraph.from_entries(entries))
+
+    filtered, delta = select_changed_rows(rows, stored_tweets, stored_users)
+
+    assert delta['tweets'] == {'inserted': 1, 'updated': 1, 'unchanged': len(entries) - 2}
+    assert delta['user_accounts'] == {'inserted': 1, 'updated': 1, 'unchanged': 5}
+    assert {row['id'] for row in filtered['tweets']} == {entries[0]['tweet']['id'], entries[2]['tweet']['id']}
+    assert sorted(row['user_id'] for row in filtered['user_accounts']) == ['1', '3']
+    # POSTED edges of the changed tweets, and of every tweet of the changed and new users
+    assert {row['tweet_id'] for row in filtered['posted']} == \
+        {entries[0]['tweet']['id'], entries[2]['tweet']['id']} | \
+        {entry['tweet']['id'] for entry in entries if entry['user_account']['user_id'] in ('1', '3')}
+    assert {row['user_id'] for row in filtered['mentions']} == {'0', '1', '2', '3'}
+
+
+def test_select_changed_rows_ignores_removed_entities(entries):
+    stored_tweets, stored_users = stored_fingerprints(build_graph_rows(StagingGraph.from_entries(entries)))
+    # Tweets and users stored by a previous run but no longer scraped are left to the cleanup
+    rows = build_graph_rows(StagingGraph.from_entries(
+        [entry for entry in entries if entry['user_account']['user_id'] != '6']))
+
+    filtered, delta = select_changed_rows(rows, stored_tweets, stored_users)
+
+    assert delta['tweets'] == {'inserted': 0, 'updated': 0, 'unchanged': len(rows['tweets'])}
+    assert delta['user_accounts'] == {'inserted': 0, 'updated': 0, 'unchanged': 6}
+    assert not filtered['tweets'] and not filtered['user_accounts'] and not filtered['posted']
+
+
+def test_full_write_counts_written_rows(entries):
+    rows = build_graph_rows(StagingGraph.from_entries(entries))
+    plan = write_batch_plan(rows, "TAO", incremental=False)
+    statements = [next(plan)]
+    try:
+        while True:
+            statements.append(plan.send(([], None)))
+    except StopIteration as stop:
+        delta = stop.value
+
+    assert delta == {'tweets': {'written': len(entries)}, 'user_accounts': {'written': 7}}
+    assert not any(name.startswith('fetch_') for name, _, _ in statements)
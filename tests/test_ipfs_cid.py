@@ -0,0 +1,25 @@
+import pytest
+
+from helpers.ipfs_cid import CHUNK_SIZE, file_cid
+
+
+@pytest.mark.parametrize("content, cid", [
+    (b"", "QmbFMke1KXqnYyBBWxB74N4c5SBnJMVAiMNRcGu6x1AwQH"),
+    (b"hello world\n", "QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o"),
+])
+def test_single_block_cids_match_ipfs(tmp_path, content, cid):
+    file_path = tmp_path / "file"
+    file_path.write_bytes(content)
+    assert file_cid(str(file_path)) == cid
+
+
+def test_files_larger_than_a_chunk_are_linked_from_a_root_node(tmp_path):
+    content = bytes(range(256)) * 1100 + b"tail"
+    assert CHUNK_SIZE < len(content) < 2 * CHUNK_SIZE
+    file_path = tmp_path / "file"
+    file_path.write_bytes(content)
+    first_chunk_path = tmp_path / "first_chunk"
+    first_chunk_path.write_bytes(content[:CHUNK_SIZE])
+
+    assert file_cid(str(file_path)) == "QmSC4zzPyULKqkFfpfexrnzwktioT1qWF9dw4ikPLVneDB"
+    assert file_cid(str(first_chunk_path)) != file_cid(str(file_path))
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import requests
+
+from helpers.ipfs_client import PinataClient
+
+
+def make_response(status_code: int, body: dict = None, headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body or {}).encode("utf-8")
+    response.headers.update(headers or {})
+    return response
+
+
+class FakeSession:
+    """
+    Stands in for the client's requests.Session, answering requests with the given responses or exceptions.
+    """
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        if "data" in kwargs:
+            b"".join(kwargs["data"])  # Read the streamed body, like a real session
+        self.requests.append((method, url))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def close(self):
+        pass
+
+
+def make_client(session: FakeSession, max_retries: int = 3) -> PinataClient:
+    client = PinataClient("key", "secret", max_retries=max_retries, backoff_secs=0)
+    client.session = session
+    return client
+
+
+def test_upload_retries_rate_limits_server_errors_and_failed_connections(tmp_path):
+    file_path = tmp_path / "dataset.json"
+    file_path.write_text("[]")
+    session = FakeSession(make_response(429, headers={"Retry-After": "0"}), make_response(503),
+                          requests.exceptions.ConnectionError("reset"), make_response(200, {"IpfsHash": "QmHash"}))
+
+    result = asyncio.run(make_client(session).upload_file(str(file_path)))
+
+    assert result["ipfs_hash"] == "QmHash" and result["file_name"] == "dataset.json"
+    assert len(session.requests) == 4
+
+
+def test_upload_gives_up_after_max_retries(tmp_path):
+    file_path = tmp_path / "dataset.json"
+    file_path.write_text("[]")
+    session = FakeSession(*[make_response(502, {"error": "bad gateway"})] * 3)
+
+    result = asyncio.run(make_client(session, max_retries=2).upload_file(str(file_path)))
+
+    assert "bad gateway" in result["error"]
+    assert len(session.requests) == 3
+
+
+def test_client_errors_are_not_retried():
+    session = FakeSession(make_response(401, {"error": "unauthorized"}))
+
+    result = asyncio.run(make_client(session).is_pinned("QmHash"))
+
+    assert "unauthorized" in result["error"]
+    assert len(session.requests) == 1
+
+
+def test_failed_connections_raise_once_retries_are_exhausted():
+    session = FakeSession(*[requests.exceptions.Timeout("timed out")] * 2)
+
+    result = asyncio.run(make_client(session, max_retries=1).download("https://gateway/ipfs/QmHash"))
+
+    assert result["error"] == "Failed to download file from IPFS: timed out"
+    assert len(session.requests) == 2
+
+
+def test_retry_delay_honours_retry_after_and_backs_off_exponentially():
+    client = PinataClient("key", "secret", backoff_secs=1, max_backoff_secs=10)
+
+    assert client._retry_delay(0, make_response(429, headers={"Retry-After": "3"})) == 3
+    assert client._retry_delay(0, make_response(429, headers={"Retry-After": "120"})) == 10
+    assert 2 <= client._retry_delay(2) <= 4
+    assert 5 <= client._retry_delay(8) <= 10
@@ -0,0 +1,17 @@
+from staging_graph import StagingGraph
+
+
+def test_entries_round_trip(entries):
+    assert list(StagingGraph.from_entries(entries).entries()) == entries
+
+
+def test_normalized_round_trip_keeps_per_tweet_engagement(entries):
+    graph = StagingGraph.from_entries(entries)
+    dataset = {name: list(rows) for name, rows in graph.normalized_sections()}
+    assert list(StagingGraph.from_normalized(dataset).entries()) == entries
+
+
+def test_chunks_keep_per_tweet_engagement(entries):
+    graph = StagingGraph.from_entries(entries)
+    rebuilt = {entry["tweet"]["id"]: entry for chunk in graph.chunks(10) for entry in chunk.entries()}
+    assert rebuilt == {entry["tweet"]["id"]: entry for entry in entries}
@@ -1,94 +1,409 @@
+import os
+import glob
+import shutil
 import asyncio
-from datetime import datetime
+import tempfile
+from datetime import datetime, timedelta
 from celery import shared_task
+from apify.actor_backends import get_actor_backend
 from apify.apidojo_tweet_scraper import ApiDojoTweetScraper
 from loguru import logger
 
+from async_scraper_graph_indexer import AsyncScraperGraphIndexer, create_async_driver
+
 from database.session_manager import DatabaseSessionManager
-from helpers.ipfs_utils import upload_file_to_ipfs
-from helpers.json_validation_helpers import validate_json_dataset  # Import the validation function
+from helpers.dataset_export import (DatasetExport, NORMALIZED_SCHEMA_VERSION, dataset_file_name, export_dataset,
+                                    export_normalized_dataset)
+from helpers.dataset_chunks import build_manifest, export_dataset_chunks, write_manifest
+from helpers.dataset_loader import (is_dataset_manifest, merge_normalized_datasets, parse_dataset,
+                                    staging_graph_from_dataset)
+from helpers.ipfs_client import PinataClient
+from helpers.ipfs_utils import ipfs_gateway_link
+from helpers.json_validation_helpers import load_item_validator, load_section_validators
 from database.models.dataset_links import DatasetLinkManager
+from database.models.scrape_watermarks import ScrapeWatermarkManager
 from settings import settings
+from staging_graph import StagingGraph
+
+
+class IndexingContext:
+    """
+    Clients shared by every token indexed in one run: a single actor backend, a single IPFS client (and its
+    connection pool), a single graph driver and a single database engine, instead of one of each per token.
+    They are bound to the running event loop and are closed with it.
+    """
+    def __init__(self):
+        self.actor_backend = get_actor_backend()
+        self.ipfs_client = PinataClient(settings.PINATA_API_KEY, settings.PINATA_SECRET_API_KEY)
+        self.graph_driver = create_async_driver() if settings.GRAPH_INDEXING_ENABLED else None
+        self.session_manager = DatabaseSessionManager()
+        self.session_manager.init(settings.DATABASE_URL)
+
+    async def close(self):
+        await self.actor_backend.close()
+        await self.ipfs_client.close()
+        if self.graph_driver is not None:
+            await self.graph_driver.close()
+        await self.session_manager.close()
+
 
 @shared_task
-def run_index_tweets():
+def run_index_tweets(tokens=None):
     """Run the asynchronous tweet indexing task."""
-    asyncio.run(index_tweets())
+    asyncio.run(index_tokens(tokens))
+
+
+async def index_tokens(tokens=None, max_concurrency: int = None) -> dict:
+    """
+    Index several tokens concurrently, at most `max_concurrency` at a time.
 
+    Args:
+        tokens (list[str], optional): Tokens to index. Defaults to the configured SCRAPE_TOKENS.
+        max_concurrency (int, optional): Number of tokens indexed at once. Defaults to INDEXER_CONCURRENCY.
+
+    Returns:
+        dict: Result of index_tweets per token.
+    """
+    tokens = list(dict.fromkeys(tokens or settings.get_scrape_tokens()))
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or settings.INDEXER_CONCURRENCY))
+    context = IndexingContext()
+
+    async def index_bounded(token):
+        async with semaphore:
+            return await index_tweets(token, context)
+
+    try:
+        outcomes = await asyncio.gather(*(index_bounded(token) for token in tokens), return_exceptions=True)
+    finally:
+        await context.close()
+
+    results = {}
+    for token, outcome in zip(tokens, outcomes):
+        if isinstance(outcome, Exception):
+            outcome = {"status": "failed", "error": str(outcome)}
+        results[token] = outcome
+        logger.info(f"Indexing result for token {token}: {outcome}")
+
+    failed = [token for token, result in results.items() if result["status"] == "failed"]
+    logger.info(f"Indexed {len(tokens) - len(failed)} of {len(tokens)} tokens, failed: {failed}")
+    return results
 
-async def index_tweets(token=None):
+
+async def publish_dataset(token: str, dataset: DatasetExport, context: IndexingContext) -> str:
+    """
+    Upload a validated dataset to IPFS and store its link in the database.
+
+    Args:
+        token (str): Token the dataset belongs to.
+        dataset (DatasetExport): The exported dataset file.
+        context (IndexingContext): Shared IPFS client and database engine.
+
+    Returns:
+        str: The IPFS link of the dataset.
+    """
+    # Streamed from disk without blocking the event loop, so graph writes proceed meanwhile
+    ipfs_response = await context.ipfs_client.upload_file(dataset.file_name)
+
+    if "error" in ipfs_response:
+        raise RuntimeError(ipfs_response["error"])
+
+    ipfs_link = ipfs_response.get("ipfs_link")
+    logger.info(f"Uploaded to IPFS: {ipfs_link}")
+
+    # Store IPFS link in the database
+    dataset_manager = DatasetLinkManager(context.session_manager)
+    await dataset_manager.store_latest_link(token=token, ipfs_link=ipfs_link)
+    logger.info(f"Stored IPFS link for token {token} in the database.")
+    return ipfs_link
+
+
+async def publish_dataset_chunks(token: str, chunks: list, manifest_file: str, context: IndexingContext,
+                                 previous_manifest: dict = None) -> str:
+    """
+    Publish a chunked dataset: upload the chunks that are not pinned yet, concurrently, then the manifest, and
+    store its IPFS link in the database. Nothing is uploaded or stored when the manifest is the one already
+    published.
+
+    Args:
+        token (str): Token the dataset was scraped for.
+        chunks (list[DatasetChunk]): The exported chunks (see export_dataset_chunks).
+        manifest_file (str): Path the manifest is written to.
+        context (IndexingContext): Shared IPFS client and database engine.
+        previous_manifest (dict, optional): Manifest of the last published dataset. Its chunks are known to be
+            pinned, so unchanged chunks are matched by SHA-256 without asking Pinata.
+
+    Returns:
+        str: The IPFS link of the manifest.
+    """
+    published = {chunk["sha256"]: chunk["cid"] for chunk in (previous_manifest or {}).get("chunks", [])}
+
+    async def publish_chunk(chunk) -> bool:
+        if chunk.dataset.sha256 in published:
+            chunk.cid = published[chunk.dataset.sha256]
+            return False
+
+        pin = await context.ipfs_client.is_pinned(chunk.cid)
+        if pin.get("pinned"):
+            return False
+        if "error" in pin:
+            logger.warning(pin["error"])
+
+        ipfs_response = await context.ipfs_client.upload_file(chunk.file_name)
+        if "error" in ipfs_response:
+            raise RuntimeError(ipfs_response["error"])
+        if ipfs_response["ipfs_hash"] != chunk.cid:
+            # Keep what Pinata pinned, later runs reuse it by SHA-256
+            logger.warning(f"Pinata CID {ipfs_response['ipfs_hash']} of chunk {chunk.name} differs from the "
+                           f"local CID {chunk.cid}")
+            chunk.cid = ipfs_response["ipfs_hash"]
+        return True
+
+    outcomes = await asyncio.gather(*(publish_chunk(chunk) for chunk in chunks), return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            raise outcome
+    logger.info(f"Uploaded {sum(outcomes)} of {len(chunks)} dataset chunks of token {token}")
+
+    manifest_cid, _ = await asyncio.to_thread(write_manifest, build_manifest(token, chunks), manifest_file)
+    dataset_manager = DatasetLinkManager(context.session_manager)
+    latest_link = await dataset_manager.get_latest_link(token)
+    if latest_link == ipfs_gateway_link(manifest_cid):
+        logger.info(f"Dataset of token {token} is unchanged, keeping {latest_link}")
+        return latest_link
+
+    ipfs_response = await context.ipfs_client.upload_file(manifest_file)
+    if "error" in ipfs_response:
+        raise RuntimeError(ipfs_response["error"])
+
+    ipfs_link = ipfs_response.get("ipfs_link")
+    logger.info(f"Uploaded manifest to IPFS: {ipfs_link}")
+    await dataset_manager.store_latest_link(token=token, ipfs_link=ipfs_link)
+    logger.info(f"Stored IPFS link for token {token} in the database.")
+    return ipfs_link
+
+
+async def load_previous_dataset(token: str, context: IndexingContext):
+    """
+    Download the last published dataset of a token, in whichever format and schema version it was published,
+    fetching all of its chunks when it was published chunked.
+
+    Returns:
+        tuple: Its tweets as a StagingGraph and its manifest (None unless chunked), or None when the token was
+        never published or the dataset cannot be read.
+    """
+    ipfs_link = await DatasetLinkManager(context.session_manager).get_latest_link(token)
+    if not ipfs_link:
+        return None
+
+    ipfs_response = await context.ipfs_client.download(ipfs_link)
+    if "error" in ipfs_response:
+        logger.error(ipfs_response["error"])
+        return None
+    try:
+        dataset = await asyncio.to_thread(parse_dataset, ipfs_response["content"])
+        manifest = None
+        if is_dataset_manifest(dataset):
+            manifest = dataset
+            chunks = []
+            for ipfs_response in await asyncio.gather(*(context.ipfs_client.download(ipfs_gateway_link(chunk["cid"]))
+                                                        for chunk in manifest["chunks"])):
+                if "error" in ipfs_response:
+                    logger.error(ipfs_response["error"])
+                    return None
+                chunks.append(await asyncio.to_thread(parse_dataset, ipfs_response["content"]))
+            dataset = merge_normalized_datasets(chunks)
+        return await asyncio.to_thread(staging_graph_from_dataset, dataset), manifest
+    except Exception as e:
+        logger.error(f"Unreadable previous dataset for token {token} at {ipfs_link}: {e}")
+        return None
+
+
+async def store_watermark(token: str, staging_graph: StagingGraph, context: IndexingContext):
+    """
+    Store the newest tweet of a published dataset as the token's scrape watermark.
+    """
+    latest = staging_graph.latest_tweet()
+    if latest is None:
+        return
+    timestamp, tweet_id = latest
+    last_tweet_timestamp = datetime.fromisoformat(timestamp).replace(tzinfo=None)  # Mapped timestamps are UTC
+    await ScrapeWatermarkManager(context.session_manager).store_watermark(token, last_tweet_timestamp, str(tweet_id))
+    logger.info(f"Stored scrape watermark for token {token}: {timestamp} ({tweet_id})")
+
+
+def keep_rejected_rows(export_dir: str):
+    """
+    Move the quarantine files of an export (see export_dataset) out of its temporary directory, into the working
+    directory.
+    """
+    for quarantine_file in glob.glob(os.path.join(export_dir, "*.rejected.ndjson")):
+        shutil.move(quarantine_file, os.path.basename(quarantine_file))
+        logger.warning(f"Kept rejected dataset rows in {os.path.basename(quarantine_file)}")
+
+
+def export_and_validate(staging_graph: StagingGraph, file_name: str):
+    """
+    Export the staging graph in the configured format and schema version, validating every entry as it is
+    written. Invalid entries are quarantined, up to MAX_REJECT_RATIO of the entries.
+
+    Returns:
+        DatasetExport: The exported file, or None when too many entries are invalid.
+    """
+    if settings.DATASET_SCHEMA_VERSION == NORMALIZED_SCHEMA_VERSION:
+        if settings.DATASET_FORMAT != "json":
+            raise ValueError(f"The {NORMALIZED_SCHEMA_VERSION} dataset schema is only written as json, "
+                             f"not {settings.DATASET_FORMAT}")
+        dataset = export_normalized_dataset(staging_graph, file_name,
+                                            load_section_validators("./schemas/dataset_schema_v2.json"),
+                                            max_reject_ratio=settings.MAX_REJECT_RATIO)
+    else:
+        schema_path = "./schemas/dataset_schema.json"  # Update with the actual schema path
+        dataset = export_dataset(staging_graph.entries(), file_name, load_item_validator(schema_path),
+                                 max_reject_ratio=settings.MAX_REJECT_RATIO, format=settings.DATASET_FORMAT)
+    if dataset is not None:
+        logger.info(f"Exported {dataset.items} tweets to {file_name} as {dataset.format} ({dataset.size} bytes, "
+                    f"sha256 {dataset.sha256})")
+    return dataset
+
+
+def export_and_validate_chunks(staging_graph: StagingGraph, base_name: str):
+    """
+    Export the staging graph as a chunked v2 dataset (see export_dataset_chunks), validating every row as it is
+    written.
+
+    Returns:
+        list[DatasetChunk]: The exported chunks, or None when too many tweets are invalid.
+    """
+    chunks = export_dataset_chunks(staging_graph, base_name,
+                                   load_section_validators("./schemas/dataset_schema_v2.json"),
+                                   max_reject_ratio=settings.MAX_REJECT_RATIO)
+    if chunks is not None:
+        logger.info(f"Exported {sum(chunk.dataset.items for chunk in chunks)} tweets to {len(chunks)} chunks "
+                    f"({sum(chunk.dataset.size for chunk in chunks)} bytes)")
+    return chunks
+
+
+async def index_tweets(token=None, context: IndexingContext = None) -> dict:
     """
     Scrape tweets for a given token, upload results to IPFS, validate JSON, and store the link in the database.
 
     Args:
         token (str): Token to scrape tweets for.
+        context (IndexingContext, optional): Shared clients. A private one is created and closed if not provided.
+
+    Returns:
+        dict: The status of the token ("indexed", "empty", "invalid" or "failed") with the tweet count,
+              IPFS link, graph delta and error, where applicable.
     """
-    token = token or settings.SCRAPE_TOKEN
+    if context is None:
+        context = IndexingContext()
+        try:
+            return await index_tweets(token, context)
+        finally:
+            await context.close()
+
+    token = token or settings.get_scrape_tokens()[0]
     miner_key = settings.MINER_KEY  # This can also be part of settings if needed
     scrape_start_date = settings.SCRAPE_START_DATE
     scrape_end_date = datetime.utcnow().strftime("%Y-%m-%d")
 
-    tweet_scraper = ApiDojoTweetScraper(token)
+    result = {"status": "failed", "tweets": 0}
 
     try:
-        # Scrape tweets
-        logger.info(f"Scraping tweets for token: {token} from {scrape_start_date} to {scrape_end_date}")
-        scraped_data = await tweet_scraper.search_token_mentions()
-        if not scraped_data:
-            logger.warning("No tweets scraped.")
-            return
+        # Resume from the watermark of the last published dataset and merge the new tweets into it, newer values
+        # win. Without a readable previous dataset the full range is scraped again.
+        staging_graph = StagingGraph()
+        previous_manifest = None
+        scrape_from_date = scrape_start_date
+        watermark = await ScrapeWatermarkManager(context.session_manager).get_watermark(token)
+        if watermark is not None:
+            previous = await load_previous_dataset(token, context)
+            if previous is not None:
+                resume_date = watermark.last_tweet_timestamp - timedelta(hours=settings.SCRAPE_OVERLAP_HOURS)
+                scrape_from_date = max(scrape_start_date, resume_date.strftime("%Y-%m-%d"))
+                staging_graph, previous_manifest = previous
+                logger.info(f"Merging into the previous dataset of token {token} ({len(staging_graph)} tweets)")
+        previous_tweets = len(staging_graph)
+
+        # Scrape tweets, deduplicating users, tokens, regions and tweets for the exporter, validator and graph
+        # writer as the pages of the actor run arrive
+        logger.info(f"Scraping tweets for token: {token} from {scrape_from_date} to {scrape_end_date}")
+        tweet_scraper = ApiDojoTweetScraper(token, start_date=scrape_from_date, backend=context.actor_backend)
+        async for entry in tweet_scraper.stream_token_mentions():
+            staging_graph.add_entry(entry)
+        if not staging_graph:
+            logger.warning(f"No tweets scraped for token: {token}")
+            return dict(result, status="empty")
+        result["tweets"] = len(staging_graph)
+        result["new_tweets"] = len(staging_graph) - previous_tweets
 
         # Generate file name with the new format
         current_timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        file_name = f"{miner_key}_tweets_{token}_{scrape_start_date}_to_{scrape_end_date}_{current_timestamp}.json"
-
-        # Export tweets to JSON
-        tweet_scraper.export_to_json(scraped_data, file_name)
-        logger.info(f"Exported tweets to {file_name}")
+        name = f"{miner_key}_tweets_{token}_{scrape_start_date}_to_{scrape_end_date}_{current_timestamp}"
 
-        # Validate the exported JSON
-        schema_path = "./schemas/dataset_schema.json"  # Update with the actual schema path
-        with open(file_name, "r") as file:
-            file_content = file.read()
-
-        is_valid = validate_json_dataset(file_content, schema_path)
-        if not is_valid:
-            logger.error(f"Validation failed for file: {file_name}")
-            return
-        logger.info(f"JSON file validated successfully: {file_name}")
-
-        # Upload JSON file to IPFS
-        ipfs_response = upload_file_to_ipfs(
-            file_name,
-            file_content,
-            settings.PINATA_API_KEY,
-            settings.PINATA_SECRET_API_KEY
-        )
+        # The exported files only live until they are published, rejected rows are kept for inspection
+        with tempfile.TemporaryDirectory(prefix="dataset_") as export_dir:
+            base_name = os.path.join(export_dir, name)
+            try:
+                # Serialization and validation are CPU bound, run them in a thread so other tokens keep scraping
+                if settings.DATASET_CHUNKED:
+                    chunks = await asyncio.to_thread(export_and_validate_chunks, staging_graph, base_name)
+                    if chunks is None:
+                        logger.error(f"Validation failed for the chunks of: {base_name}")
+                        return dict(result, status="invalid")
+                    result["size"] = sum(chunk.dataset.size for chunk in chunks)
+                    result["rejected"] = sum(chunk.dataset.rejected for chunk in chunks)
+                    result["chunks"] = len(chunks)
+                    result["format"] = "chunked/v2"
+                    publishing = publish_dataset_chunks(token, chunks, f"{base_name}.manifest.json", context,
+                                                        previous_manifest)
+                else:
+                    file_name = dataset_file_name(base_name, settings.DATASET_FORMAT, settings.DATASET_SCHEMA_VERSION)
+                    dataset = await asyncio.to_thread(export_and_validate, staging_graph, file_name)
+                    if dataset is None:
+                        logger.error(f"Validation failed for file: {file_name}")
+                        return dict(result, status="invalid")
+                    logger.info(f"JSON file validated successfully: {file_name}")
+                    result["size"] = dataset.size
+                    result["rejected"] = dataset.rejected
+                    result["sha256"] = dataset.sha256
+                    result["format"] = f"{dataset.format}/{dataset.schema_version}"
+                    publishing = publish_dataset(token, dataset, context)
 
-        if "error" in ipfs_response:
-            logger.error(ipfs_response["error"])
-            return
+                # Upload to IPFS / store the link and, if enabled, index the graph concurrently
+                tasks = [publishing]
+                if settings.GRAPH_INDEXING_ENABLED:
+                    graph_indexer = AsyncScraperGraphIndexer(driver=context.graph_driver)
+                    tasks.append(graph_indexer.create_nodes_and_edges(staging_graph, token))
 
-        ipfs_link = ipfs_response.get("ipfs_link")
-        logger.info(f"Uploaded to IPFS: {ipfs_link}")
+                outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+                errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+                for error in errors:
+                    logger.error(f"Error during indexing of token {token}: {error}")
 
-        session_manager = DatabaseSessionManager()
-        session_manager.init(settings.DATABASE_URL)
-        # Store IPFS link in the database
-        dataset_manager = DatasetLinkManager(session_manager)
-        await dataset_manager.store_latest_link(token=token, ipfs_link=ipfs_link)
-        logger.info(f"Stored IPFS link for token {token} in the database.")
+                result["ipfs_link"] = None if isinstance(outcomes[0], Exception) else outcomes[0]
+                if result["ipfs_link"]:
+                    # Only advance once the merged dataset is published, it is the base of the next run
+                    await store_watermark(token, staging_graph, context)
+                if len(outcomes) > 1 and not isinstance(outcomes[1], Exception):
+                    result["graph_delta"] = outcomes[1]
+                if errors:
+                    # A failed upload or graph write fails the token, even if the other one succeeded
+                    return dict(result, status="failed", error="; ".join(str(error) for error in errors))
+                return dict(result, status="indexed")
+            finally:
+                keep_rejected_rows(export_dir)
 
     except Exception as e:
-        logger.error(f"Error during indexing: {e}")
+        logger.error(f"Error during indexing of token {token}: {e}")
+        return dict(result, error=str(e))
 
 
 async def main():
     """
     Main function to initialize and run the tweet indexing.
     """
-    token = settings.SCRAPE_TOKEN
-    await index_tweets(token)
+    await index_tokens(settings.get_scrape_tokens())
 
 
 if __name__ == "__main__":